@@ -0,0 +1,78 @@
+import itertools
+import pickle
+
+from .board import *
+
+
+def signature(letters):
+    """Return the signature of letters: the letters sorted."""
+    return ''.join(sorted(letters))
+
+
+class AnagramIndex:
+    """
+    Words grouped by signature, for rack-only queries. Words makeable from
+    a rack are found by looking up each sub-multiset of its letter counts,
+    rather than by searching every permutation of the rack in a DAWG.
+    """
+    def __init__(self, words=()):
+        self.words = {}     # signature -> words
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return sum(len(words) for words in self.words.values())
+
+    def __contains__(self, word):
+        return word in self.words.get(signature(word), ())
+
+    def add(self, word):
+        words = self.words.setdefault(signature(word), [])
+        if word not in words:
+            words.append(word)
+
+    def anagrams(self, letters):
+        """Return the words using exactly letters."""
+        return list(self.words.get(signature(letters), ()))
+
+    def gen_subanagrams(self, letters, required='', min_len=1):
+        """
+        Generate each word of at least min_len made from some of letters
+        (WILDCARD for a blank) and containing all of required, once.
+        """
+        req_counts = rack_counts(required)
+        for sig in self._gen_signatures(rack_counts(letters), req_counts):
+            if len(sig) >= min_len:
+                yield from self.words.get(sig, ())
+
+    def _gen_signatures(self, counts, req_counts):
+        """
+        Generate the signatures of the sub-multisets of counts holding
+        req_counts, once each, with blanks spent as any letters.
+        """
+        seen = set()
+        for blank_letters in itertools.combinations_with_replacement(
+                range(BLANK), counts[BLANK]):
+            letter_counts = counts[:BLANK]
+            for k in blank_letters:
+                letter_counts[k] += 1
+            if any(req_counts[k] > n for k, n in enumerate(letter_counts)):
+                continue
+
+            present = [k for k, n in enumerate(letter_counts) if n]
+            for ns in itertools.product(*[range(req_counts[k],
+                                                letter_counts[k] + 1)
+                                          for k in present]):
+                sig = ''.join(LETTERS[k]*n for k, n in zip(present, ns))
+                if sig not in seen:
+                    seen.add(sig)
+                    yield sig
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self.words, f, pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        with open(path, 'rb') as f:
+            self.words = pickle.load(f)
+        return self
@@ -0,0 +1,204 @@
+"""
+Batch solving. `wwfbatch <input> [<dictionary>]` reads positions from a
+JSONL file (- for stdin) or a directory of board files and writes the top k
+plays for each as JSONL. The lexicon and worker pool are loaded once, and
+several positions are solved at a time.
+
+Each JSONL record holds a "rack" and either a "board", in the board file
+format as one string or a list of rows, or a "board_file", relative to the
+input file (or working directory). An "id" is optional and defaults to the
+line number. Board files in a directory are solved with the --rack given,
+named by file name.
+
+Each result is {"id", "plays"}, best first, or {"id", "error"} if the
+position couldn't be solved. Plays give the first square's row and col.
+"""
+import argparse
+import contextlib
+import json
+import os
+import queue
+import sys
+
+from .lexicon import (
+    DICTIONARIES,
+    DEFAULT_DICTIONARY,
+    get_dictionary,
+    load_lex_dawg,
+)
+from .solver import *
+
+MAX_IN_FLIGHT = 16
+
+
+def read_records(path, rack=None):
+    """
+    Generate the records in path, a JSONL file or a directory of board
+    files, with rack as their default rack. Lines that aren't JSON objects
+    are generated as records holding an error.
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            board_file = os.path.join(path, name)
+            if os.path.isfile(board_file):
+                yield {'id': name, 'board_file': board_file, 'rack': rack}
+        return
+
+    base_dir = os.path.dirname(path) if path != '-' else ''
+    f = sys.stdin if path == '-' else open(path)
+    with f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('expected a JSON object')
+            except ValueError as e:
+                yield {'id': line_num, 'error': f'Invalid record: {e}'}
+                continue
+
+            record.setdefault('id', line_num)
+            if record.get('rack') is None:
+                record['rack'] = rack
+            if 'board_file' in record:
+                if not isinstance(record['board_file'], str):
+                    yield {'id': record['id'],
+                           'error': f"Invalid board_file "
+                                    f"{record['board_file']!r}"}
+                    continue
+                record['board_file'] = os.path.join(base_dir,
+                                                    record['board_file'])
+            yield record
+
+
+def load_position(record):
+    """Return the (board, rack) for a record, or raise ValueError."""
+    if 'error' in record:
+        raise ValueError(record['error'])
+
+    letters = record.get('rack')
+    if not isinstance(letters, str) or not letters.strip() or any(
+            c not in LETTER_INDEX and c != WILDCARD for c in letters.strip()):
+        raise ValueError(f'Invalid rack {letters!r}')
+
+    if 'board' not in record and 'board_file' not in record:
+        raise ValueError('No board or board_file')
+
+    board = Board()
+    try:
+        # Tile bag warnings would end up in the output
+        with contextlib.redirect_stdout(sys.stderr):
+            if 'board_file' in record:
+                board.load(record['board_file'])
+            else:
+                rows = record['board']
+                if isinstance(rows, str):
+                    rows = rows.splitlines()
+                board.load_lines(rows)
+    except (AttributeError, IndexError, KeyError, TypeError) as e:
+        raise ValueError(f'Invalid board: {e!r}') from e
+    return board, Rack(letters.strip())
+
+
+def play_record(play):
+    """Return a play as a JSON object, with its first square on the board."""
+    row, col = (play.j, play.i) if play.vertical else (play.i, play.j)
+    return {'word': play.word, 'row': int(row), 'col': int(col),
+            'vertical': bool(play.vertical), 'score': int(play.score),
+            'remaining': play.remaining}
+
+
+def solve_batch(records, lex_dawg, k=NUM_BEST_WORDS, in_flight=MAX_IN_FLIGHT,
+                ordered=True):
+    """
+    Generate (id, plays, error) for each record: its top k plays overall,
+    best last, or the exception it failed with. Up to in_flight records are
+    solved or waiting to be generated at a time, their row tasks sharing
+    the engine's pool. Results come in record order if ordered, otherwise as
+    they finish.
+    """
+    engine = get_engine(lex_dawg)
+    done = queue.Queue()    # (seq, results, error) as solves finish
+    ids = {}                # seq: id, for records not yet generated
+    finished = {}           # seq: (results, error), waiting for their turn
+    next_seq = 0
+
+    def gen_finished():
+        """Wait for a solve to finish, then generate what's ready."""
+        nonlocal next_seq
+        seq, results, error = done.get()
+        finished[seq] = (results, error)
+        ready = [seq] if not ordered else []
+        while ordered and next_seq in finished:
+            ready.append(next_seq)
+            next_seq += 1
+
+        for seq in ready:
+            results, error = finished.pop(seq)
+            plays = None
+            if error is None:
+                plays = merge_plays(results, k, mode='global')
+                plays = [play for play in plays if play.word]
+            yield ids.pop(seq), plays, error
+
+    for seq, record in enumerate(records):
+        ids[seq] = record.get('id', seq)
+        try:
+            board, rack = load_position(record)
+            engine.submit(
+                board, rack, k, mode='global',
+                callback=lambda results, seq=seq: done.put((seq, results,
+                                                            None)),
+                error_callback=lambda error, seq=seq: done.put((seq, None,
+                                                                error)))
+        except Exception as e:  # one bad record mustn't stop the batch
+            done.put((seq, None, e))
+
+        while len(ids) >= in_flight:
+            yield from gen_finished()
+
+    while ids:
+        yield from gen_finished()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='wwfbatch',
+        description='Solve positions from JSONL records or a directory of '
+                    'board files, writing the top plays for each as JSONL.')
+    parser.add_argument('input',
+                        help='JSONL file, - for stdin, or board directory')
+    parser.add_argument('dictionary', nargs='?', default=DEFAULT_DICTIONARY,
+                        choices=DICTIONARIES)
+    parser.add_argument('--gaddag', action='store_true',
+                        help='generate moves with a GADDAG')
+    parser.add_argument('--rack', help='rack for records without one')
+    parser.add_argument('-k', type=int, default=NUM_BEST_WORDS,
+                        help='plays per position (default %(default)s)')
+    parser.add_argument('--in-flight', type=int, default=MAX_IN_FLIGHT,
+                        help='positions solved at once (default %(default)s)')
+    parser.add_argument('--unordered', action='store_true',
+                        help='write results as they finish, not in order')
+    parser.add_argument('-o', '--output', help='output file (default stdout)')
+    args = parser.parse_args()
+
+    lex_dawg = load_lex_dawg(*get_dictionary(args.dictionary), args.gaddag)
+    records = read_records(args.input, args.rack)
+    output = (open(args.output, 'w') if args.output else
+              contextlib.nullcontext(sys.stdout))
+    with output as output:
+        for record_id, plays, error in solve_batch(
+                records, lex_dawg, args.k, max(args.in_flight, 1),
+                not args.unordered):
+            if error is not None:
+                result = {'id': record_id, 'error': str(error)}
+            else:
+                result = {'id': record_id,
+                          'plays': [play_record(play)
+                                    for play in reversed(plays)]}
+            print(json.dumps(result), file=output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,594 @@
+"""
+Benchmarks for the solver. Run with `wwfbench <board_file> <letters>
+[<dictionary>]`, `wwfbench --startup [<dictionary> ...]` for lexicon
+startup time and memory, or `wwfbench --suite [<dictionary> ...]` for the
+benchmark suite (see bench_suite).
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+from .lexicon import (
+    DICTIONARIES,
+    DEFAULT_DICTIONARY,
+    get_dictionary,
+    get_lexicon,
+    load_lex_dawg,
+)
+from . import scrabble_dawg
+from .solver import *
+from .solver import _eval_endgame
+
+BENCH_SEED = 2019
+BENCH_BOARDS = ('example_board', 'test_board.txt')
+BENCH_RACKS = ('aeinrst', 'ssdpokb', 'qzxjkvw', 'eeioubn')
+CORPUS_GAMES = 2
+MIDGAME_TURNS = (2, 5)
+ENDGAME_DEPTH = 2
+SUITE_OUTPUT = 'bench_results.json'
+# Dictionaries with distinct words (sowpods_gz is sowpods, gzipped)
+SUITE_DICTIONARIES = ('enable', 'sowpods', 'comb')
+
+
+def _legacy_args(board, rack, lex_dawg):
+    """Per-anchor (board, rack, lex_dawg, anchor, []) args, as shipped before
+    solves went through a SolverEngine."""
+    board.calc_row_valid_letters(lex_dawg)
+    tboard = board.transpose(recalc=True, dawg=lex_dawg)
+    args = []
+    for oboard in (board, tboard):
+        for anchor in get_anchors(oboard):
+            args.append((oboard, rack, lex_dawg, anchor, []))
+    return args
+
+
+def _legacy_solve(board, rack, lex_dawg):
+    """Solve the way solve_board used to: a fresh pool, one task per anchor."""
+    pool = Pool()
+    try:
+        results = pool.starmap(_legacy_generate_moves,
+                               _legacy_args(board, rack, lex_dawg),
+                               chunksize=1)
+    finally:
+        pool.terminate()
+    return [play for plays in results for play in plays]
+
+
+def _legacy_generate_moves(board, rack, lex_dawg, anchor, best_words):
+    return generate_moves(board, rack, lex_dawg, anchor,
+                          PlayCollector(mode='anchor')).plays()
+
+
+def _task_bytes(tasks):
+    return sum(len(pickle.dumps(task, pickle.HIGHEST_PROTOCOL))
+               for task in tasks)
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_payload(board, rack, lex_dawg, repeat=5):
+    """
+    Compare bytes serialized and wall time per solve between per-anchor
+    legacy tasks and SolverEngine's row tasks, counting the engine's
+    payload, shared once per solve, with its tasks.
+    """
+    engine = get_engine(lex_dawg)
+    engine.solve(board, rack)       # warm up the pool
+
+    legacy_args = _legacy_args(board, rack, lex_dawg)
+    solve_id, tasks = engine.get_tasks(board, rack)
+    engine.release_solve(solve_id)
+    return {
+        'legacy': {
+            'tasks': len(legacy_args),
+            'bytes': _task_bytes(legacy_args),
+            'seconds': _time(lambda: _legacy_solve(board, rack, lex_dawg),
+                             repeat),
+        },
+        'engine': {
+            'tasks': len(tasks),
+            'bytes': _task_bytes(tasks) + len(pack_solve(board, rack)),
+            'seconds': _time(lambda: engine.solve(board, rack), repeat),
+        },
+    }
+
+
+def _generate_all(board, rack, lex_dawg):
+    """Generate every play on board in this process, returning how many."""
+    board.ensure_valid_letters(lex_dawg)
+    num_plays = 0
+    for oboard in (board, board.transpose()):
+        collector = PlayCollector(mode='all')
+        for i, anchors in get_row_anchors(oboard):
+            generate_row_moves(oboard, rack, lex_dawg, i, anchors, collector)
+        num_plays += len(collector)
+    return num_plays
+
+
+def _gen_all_plays(board, rack, lex_dawg):
+    """Generate (oriented board, play) for every play on board."""
+    board.ensure_valid_letters(lex_dawg)
+    for oboard in (board, board.transpose()):
+        collector = PlayCollector(mode='all')
+        for i, anchors in get_row_anchors(oboard):
+            generate_row_moves(oboard, rack, lex_dawg, i, anchors, collector)
+        for play in collector.plays():
+            yield oboard, play
+
+
+def blank_racks(letters):
+    """Return letters with its last one and two letters swapped for blanks."""
+    letters = letters.replace(WILDCARD, '')
+    return [letters[:max(len(letters) - n, 0)] + WILDCARD*n for n in (1, 2)]
+
+
+def bench_blanks(board, letters, lex_dawg, repeat=3):
+    """
+    Compare plays generated and wall time per generation (in process, no
+    pool) between trying every blank assignment and keeping only the best,
+    for 1- and 2-blank versions of the rack letters.
+    """
+    results = {}
+    for rack_letters in blank_racks(letters):
+        rack = Rack(rack_letters)
+        results[rack_letters] = {}
+        for name, all_blanks in (('all', True), ('best', False)):
+            lex_dawg.all_blank_assignments = all_blanks
+            try:
+                results[rack_letters][name] = {
+                    'plays': _generate_all(board, rack, lex_dawg),
+                    'seconds': _time(
+                        lambda: _generate_all(board, rack, lex_dawg), repeat),
+                }
+            finally:
+                del lex_dawg.all_blank_assignments
+    return results
+
+
+def _count_nodes(lex_dawg, fn):
+    """
+    Call fn, returning how many nodes lex_dawg expanded meanwhile, counted
+    by wrapping its _gen_square, which runs once per node expanded.
+    """
+    gen_square = lex_dawg._gen_square
+    num_nodes = 0
+
+    def counting_gen_square(*args):
+        nonlocal num_nodes
+        num_nodes += 1
+        return gen_square(*args)
+
+    lex_dawg._gen_square = counting_gen_square
+    try:
+        fn()
+    finally:
+        del lex_dawg._gen_square
+    return num_nodes
+
+
+def bench_pruning(board, letters, lex_dawg, repeat=3):
+    """
+    Compare plays generated, lexicon nodes expanded and wall time per
+    generation (in process, no pool) without and with pruning on the
+    lexicon's subtree bounds, for the rack letters and their 1- and 2-blank
+    versions.
+    """
+    results = {}
+    for rack_letters in [letters] + blank_racks(letters):
+        rack = Rack(rack_letters)
+        results[rack_letters] = {}
+        for name, prune in (('off', False), ('on', True)):
+            lex_dawg.prune = prune
+            try:
+                results[rack_letters][name] = {
+                    'plays': _generate_all(board, rack, lex_dawg),
+                    'nodes': _count_nodes(
+                        lex_dawg,
+                        lambda: _generate_all(board, rack, lex_dawg)),
+                    'seconds': _time(
+                        lambda: _generate_all(board, rack, lex_dawg), repeat),
+                }
+            finally:
+                del lex_dawg.prune
+    return results
+
+
+# Run in a fresh interpreter: load a lexicon file and report the seconds
+# taken since startup, the peak RSS and the private (anonymous) RSS in KB.
+# ru_maxrss would include the parent's peak from before exec, so /proc is
+# read where there is one; mapped lexicon pages count as file RSS there,
+# shared with every process mapping the same file.
+_STARTUP_SCRIPT = """
+import resource, sys, time
+start = time.perf_counter()
+from scrabble_solver.lexicon import ARTIFACTS
+path, kind, mode = sys.argv[1:]
+if mode != 'none':
+    lex_dawg = ARTIFACTS[kind][2]().load(path, use_mmap=mode == 'mmap')
+    'quiz' in lex_dawg
+seconds = time.perf_counter() - start
+try:
+    with open('/proc/self/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    rss_kb = int(status['VmHWM'].split()[0])
+    private_kb = int(status['RssAnon'].split()[0])
+except OSError:
+    rss_kb = private_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(seconds, rss_kb, private_kb)
+"""
+
+STARTUP_MODES = ('none', 'mmap', 'read')
+
+
+def bench_startup(names=('enable', 'sowpods', 'comb'),
+                  kinds=('dawg', 'gaddag'), repeat=3):
+    """
+    Time fresh processes loading each lexicon, memory-mapped or read into
+    memory ('none' only imports the package), and report their peak and
+    private RSS.
+    Lexicons are built first, outside the timings. Seconds are wall time
+    for the whole process, and from import to loaded; the best of repeat.
+    """
+    env = dict(os.environ,
+               PYTHONPATH=os.path.dirname(os.path.dirname(__file__)))
+    results = {}
+    for name in names:
+        lexicon = get_lexicon(*get_dictionary(name))
+        lexicon.ensure(kinds)
+        for kind in kinds:
+            for mode in STARTUP_MODES:
+                runs = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    out = subprocess.run(
+                        [sys.executable, '-c', _STARTUP_SCRIPT,
+                         lexicon.path(kind), kind, mode],
+                        env=env, stdout=subprocess.PIPE, check=True,
+                        universal_newlines=True).stdout
+                    load_seconds, rss_kb, private_kb = out.split()
+                    runs.append((time.perf_counter() - start,
+                                 float(load_seconds), int(rss_kb),
+                                 int(private_kb)))
+                results.setdefault(name, {}).setdefault(kind, {})[mode] = {
+                    'seconds': min(run[0] for run in runs),
+                    'load_seconds': min(run[1] for run in runs),
+                    'rss_kb': min(run[2] for run in runs),
+                    'private_kb': min(run[3] for run in runs),
+                }
+    return results
+
+
+def board_text(tiles):
+    """Return tiles in the board file format."""
+    return '\n'.join(' '.join(TILE_LETTERS[tile] or '.' for tile in row)
+                     for row in tiles)
+
+
+def _load_board(text):
+    board = Board()
+    with contextlib.redirect_stdout(io.StringIO()):     # tile bag warnings
+        board.load_lines(text.splitlines())
+    return board
+
+
+def _best_play(board, rack, lex_dawg):
+    """Return the highest scoring play, in this process, or a pass."""
+    best = Play()
+    for oboard, play in _gen_all_plays(board, rack, lex_dawg):
+        if play.score > best.score:
+            play.vertical = oboard is not board
+            best = play
+    return best
+
+
+def gen_corpus(seed=BENCH_SEED):
+    """
+    Return the suite's positions, as {"name", "board" (text), "rack"} and,
+    for endgames, "opp_rack": each of BENCH_RACKS on each of BENCH_BOARDS,
+    then the positions after MIDGAME_TURNS and at the end of the bag in
+    CORPUS_GAMES games of greedy self-play. Games draw tiles from numpy's
+    generator seeded with seed and play with the default dictionary's DAWG,
+    whichever lexicons are benchmarked.
+    """
+    corpus = []
+    for board_name in BENCH_BOARDS:
+        with open(os.path.join(os.path.dirname(__file__), board_name)) as f:
+            text = f.read()
+        for letters in BENCH_RACKS:
+            corpus.append({'name': f'{board_name}:{letters}', 'board': text,
+                           'rack': letters})
+
+    lex_dawg = load_lex_dawg(*get_dictionary(DEFAULT_DICTIONARY))
+    random_state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        for game in range(CORPUS_GAMES):
+            board = Board()
+            racks = [Rack(), Rack()]
+            for rack in racks:
+                rack.draw_from_board(board)
+
+            turn = passes = 0
+            while board.get_remaining_tiles() and passes < 2:
+                rack = racks[turn % 2]
+                if turn in MIDGAME_TURNS:
+                    corpus.append({'name': f'game{game}:turn{turn}',
+                                   'board': board_text(board.board),
+                                   'rack': str(rack)})
+                play = _best_play(board, rack, lex_dawg)
+                passes = 0 if play.word else passes + 1
+                if play.word:
+                    board = board.add_word(play, rack, lex_dawg)
+                    rack.draw_from_board(board)
+                turn += 1
+
+            if not board.get_remaining_tiles():
+                corpus.append({'name': f'game{game}:endgame',
+                               'board': board_text(board.board),
+                               'rack': str(racks[turn % 2]),
+                               'opp_rack': str(racks[(turn + 1) % 2])})
+    finally:
+        np.random.set_state(random_state)
+    return corpus
+
+
+@contextlib.contextmanager
+def _scoring_off():
+    """Generate plays without keeping up their scores, which are all 0."""
+    add_square, final_score = scrabble_dawg._add_square, \
+        scrabble_dawg._final_score
+    scrabble_dawg._add_square = lambda score, square, letter, placed: score
+    scrabble_dawg._final_score = lambda score: 0
+    try:
+        yield
+    finally:
+        scrabble_dawg._add_square, scrabble_dawg._final_score = \
+            add_square, final_score
+
+
+def _bench_lexicon(corpus, lex_dawg, repeat):
+    """Time each phase of solving the corpus with lex_dawg."""
+    boards = [_load_board(position['board']) for position in corpus]
+    results = {}
+
+    def cross_checks():
+        for board in boards:
+            board.calc_row_valid_letters(lex_dawg)
+
+    results['cross_checks'] = {'boards': len(boards),
+                               'seconds': _time(cross_checks, repeat)}
+
+    def anchors():
+        for board in boards:
+            anchor_mask(board.board)
+            get_row_anchors(board)
+            get_row_anchors(board.transpose())
+
+    results['anchors'] = {
+        'boards': len(boards),
+        'anchors': sum(int(board.anchors.sum()) for board in boards),
+        'seconds': _time(anchors, repeat),
+    }
+
+    # Generation includes the plays' incremental scores
+    racks = [[position['rack'].replace(WILDCARD, '')] +
+             blank_racks(position['rack']) for position in corpus]
+    for blanks, phase in enumerate(('generation_0_blanks',
+                                    'generation_1_blank',
+                                    'generation_2_blanks')):
+        rack_boards = [(board, Rack(board_racks[blanks]))
+                       for board, board_racks in zip(boards, racks)]
+
+        def generation():
+            return sum(_generate_all(board, rack, lex_dawg)
+                       for board, rack in rack_boards)
+
+        results[phase] = {'racks': len(rack_boards), 'plays': generation(),
+                          'seconds': _time(generation, repeat)}
+
+    # Plays are scored as they are built, so scoring is timed as the
+    # difference from generating without it, taking the fastest of runs
+    # alternating between the two
+    rack_boards = [(board, Rack(board_racks[0]))
+                   for board, board_racks in zip(boards, racks)]
+
+    def generation():
+        return sum(_generate_all(board, rack, lex_dawg)
+                   for board, rack in rack_boards)
+
+    scored_seconds, unscored_seconds = [], []
+    for _ in range(repeat):
+        with _scoring_off():
+            unscored_seconds.append(_time(generation, 1))
+        scored_seconds.append(_time(generation, 1))
+    results['scoring'] = {
+        'racks': len(rack_boards), 'plays': generation(),
+        'seconds': min(scored_seconds) - min(unscored_seconds),
+        'unscored_seconds': min(unscored_seconds),
+    }
+
+    endgames = [(board, position) for board, position in zip(boards, corpus)
+                if 'opp_rack' in position]
+    best = []
+
+    def endgame():
+        best.clear()
+        for board, position in endgames:
+            with contextlib.redirect_stdout(io.StringIO()):
+                seqs = _eval_endgame(lex_dawg, board, Rack(position['rack']),
+                                     Rack(position['opp_rack']),
+                                     ENDGAME_DEPTH)
+            best.append([str(seqs[0][0][0]), seqs[0][0][-1]])
+
+    results['endgame'] = {'positions': len(endgames), 'depth': ENDGAME_DEPTH,
+                          'seconds': _time(endgame, repeat), 'best': best}
+    return results
+
+
+def bench_suite(corpus, names=SUITE_DICTIONARIES, kinds=('dawg', 'gaddag'),
+                repeat=3):
+    """
+    Time cross-check computation, anchor finding, move generation for
+    racks with 0, 1 and 2 blanks, the incremental scoring within it (for
+    racks without blanks) and endgame search over corpus
+    (from gen_corpus) with each lexicon, in this process apart from the
+    endgame's solves. Lexicons are built first, outside the timings.
+    Seconds are the mean of repeat runs over the whole corpus, alongside
+    counts of the work done, which should match between runs being
+    compared. Each lexicon's engines are closed before the next is timed.
+    """
+    results = {}
+    for name in names:
+        lexicon = get_lexicon(*get_dictionary(name))
+        lexicon.ensure(kinds)
+        for kind in kinds:
+            lex_dawg = lexicon.load(kind)
+            try:
+                results.setdefault(name, {})[kind] = _bench_lexicon(
+                    corpus, lex_dawg, repeat)
+            finally:
+                close_engine(lex_dawg)
+    return {
+        'seed': BENCH_SEED,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'corpus': corpus,
+        'results': results,
+    }
+
+
+def _gen_suite_phases(suite):
+    for name, kinds in suite['results'].items():
+        for kind, phases in kinds.items():
+            for phase, result in phases.items():
+                yield (name, kind, phase), result
+
+
+def _suite_main(args):
+    parser = argparse.ArgumentParser(
+        prog='wwfbench --suite',
+        description='Time each phase of solving a fixed corpus of positions '
+                    'with each lexicon, saving the results as JSON.')
+    parser.add_argument('dictionaries', nargs='*', metavar='dictionary',
+                        help=f"dictionaries to time, of "
+                             f"{', '.join(DICTIONARIES)} (default "
+                             f"{' '.join(SUITE_DICTIONARIES)})")
+    parser.add_argument('-o', '--output', default=SUITE_OUTPUT,
+                        help='results file (default %(default)s)')
+    parser.add_argument('--corpus',
+                        help='saved results to reuse the positions of')
+    parser.add_argument('--compare',
+                        help='saved results to print the change from')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per timing (default %(default)s)')
+    args = parser.parse_args(args)
+    for name in args.dictionaries:
+        if name not in DICTIONARIES:
+            parser.error(f"Unknown dictionary '{name}'")
+
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus = json.load(f)['corpus']
+    else:
+        corpus = gen_corpus()
+    suite = bench_suite(corpus, args.dictionaries or SUITE_DICTIONARIES,
+                        repeat=max(args.repeat, 1))
+
+    output = args.output
+    with open(output, 'w') as f:
+        json.dump(suite, f, indent=2)
+
+    old = {}
+    if args.compare:
+        with open(args.compare) as f:
+            old = dict(_gen_suite_phases(json.load(f)))
+    for (name, kind, phase), result in _gen_suite_phases(suite):
+        line = f"{name:>10} {kind:>6} {phase:>19}: " \
+               f"{result['seconds']*1000:8.1f}ms"
+        old_result = old.get((name, kind, phase))
+        if old_result:
+            line += f" (was {old_result['seconds']*1000:.1f}ms"
+            if old_result['seconds'] > 0:
+                line += f", {result['seconds']/old_result['seconds']:.2f}x"
+            line += ')'
+            if any(old_result.get(key) != value
+                   for key, value in result.items()
+                   if not key.endswith('seconds')):
+                line += ' [different work]'
+        print(line)
+    print(f'Saved to {output}')
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--suite':
+        return _suite_main(sys.argv[2:])
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--startup':
+        results = bench_startup(sys.argv[2:] or DICTIONARIES)
+        for name, kinds in results.items():
+            for kind, modes in kinds.items():
+                for mode, result in modes.items():
+                    print(f"{name:>8} {kind:>6} {mode:>4}: "
+                          f"{result['seconds']*1000:.0f}ms cold start, "
+                          f"{result['load_seconds']*1000:.0f}ms import and "
+                          f"load, {result['rss_kb']/1024:.1f}MB peak RSS, "
+                          f"{result['private_kb']/1024:.1f}MB private")
+        return
+
+    if len(sys.argv) < 3:
+        print('USAGE: wwfbench <board_file> <letters> [<dictionary>]')
+        print('       wwfbench --startup [<dictionary> ...]')
+        print('       wwfbench --suite [<dictionary> ...] [-o <file>] '
+              '[--corpus <file>] [--compare <file>] [--repeat <n>]')
+        print(f" - Available dictionaries: {', '.join(DICTIONARIES)}")
+        exit(0)
+
+    board_file = sys.argv[1].strip()
+    rack_ls = sys.argv[2].strip()
+    dictionary = sys.argv[3] if len(sys.argv) > 3 else 'enable'
+    lex_dawg = load_lex_dawg(*get_dictionary(dictionary))
+
+    board = Board()
+    board.load(board_file)
+    rack = Rack(rack_ls)
+
+    results = bench_payload(board, rack, lex_dawg)
+    for name, result in results.items():
+        print(f"{name:>8}: {result['tasks']} tasks, "
+              f"{result['bytes']} bytes serialized, "
+              f"{result['seconds']*1000:.1f}ms per solve")
+
+    results = bench_blanks(board, rack_ls, lex_dawg)
+    for rack_letters, rack_results in results.items():
+        for name, result in rack_results.items():
+            print(f"{rack_letters:>8} {name:>4} blank assignments: "
+                  f"{result['plays']} plays, "
+                  f"{result['seconds']*1000:.1f}ms per generation")
+
+    results = bench_pruning(board, rack_ls, lex_dawg)
+    for rack_letters, rack_results in results.items():
+        for name, result in rack_results.items():
+            print(f"{rack_letters:>8} pruning {name:>3}: "
+                  f"{result['plays']} plays, {result['nodes']} nodes, "
+                  f"{result['seconds']*1000:.1f}ms per generation")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import numpy as np
 import copy
+import random
 
 BOARD_LEN = 11
 RACK_TILES = 7
@@ -7,65 +8,252 @@ RACK_TILES = 7
 all_letters = [l for l in 'abcdefghijklmnopqrstuvwxyz']
 WILDCARD = '?'
 
+# Sets of letters are bitmasks with bit k set for letter k ('a' is 0), and
+# racks are counts of each letter with blanks counted at index BLANK.
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+LETTER_BYTES = LETTERS.encode('utf8')
+LETTER_INDEX = {letter: k for k, letter in enumerate(LETTERS)}
+ALL_LETTERS_MASK = (1 << len(LETTERS)) - 1
+BLANK = len(LETTERS)
+
+
+def letters_mask(letters):
+    mask = 0
+    for letter in letters:
+        mask |= 1 << LETTER_INDEX[letter.lower()]
+    return mask
+
+
+def mask_letters(mask):
+    return ''.join(letter for k, letter in enumerate(LETTERS)
+                   if mask >> k & 1)
+
+
+def rack_counts(letters):
+    counts = [0]*(BLANK + 1)
+    for letter in letters:
+        counts[BLANK if letter == WILDCARD else LETTER_INDEX[letter]] += 1
+    return counts
+
+
+def counts_letters(counts):
+    return ''.join(LETTERS[k]*n for k, n in enumerate(counts[:BLANK])) + \
+           WILDCARD*counts[BLANK]
+
+
+# Board squares hold uint8 tile codes: EMPTY, or a letter's index + 1 with
+# BLANK_TILE set if it was played from a blank
+EMPTY = 0
+BLANK_TILE = 0x20
+TILE_LETTERS = ['']*(2*BLANK_TILE)
+for _k, _letter in enumerate(LETTERS):
+    TILE_LETTERS[_k + 1] = _letter
+    TILE_LETTERS[(_k + 1) | BLANK_TILE] = _letter.upper()
+
+
+def letter_tile(letter):
+    """Return the tile code for letter, uppercase for a blank."""
+    if not letter:
+        return EMPTY
+    tile = LETTER_INDEX[letter.lower()] + 1
+    if letter.isupper():
+        tile |= BLANK_TILE
+    return tile
+
+
+def tile_mask(tile):
+    """Return the letter mask of a (non-empty) tile code."""
+    return 1 << ((int(tile) & (BLANK_TILE - 1)) - 1)
+
+
+def gen_adjacent_spots(i, j):
+    dirs = [-1, 1]
+    for d in dirs:
+        if i+d >= 0 and i+d < BOARD_LEN:
+            yield i+d, j
+        if j+d >= 0 and j+d < BOARD_LEN:
+            yield i, j+d
+
+
+def anchor_mask(tiles):
+    """
+    Return a boolean array marking the anchors of tiles: empty squares next
+    to a tile, or the center square if the board is empty.
+    """
+    filled = tiles != EMPTY
+    adjacent = np.zeros_like(filled)
+    adjacent[1:] |= filled[:-1]
+    adjacent[:-1] |= filled[1:]
+    adjacent[:,1:] |= filled[:,:-1]
+    adjacent[:,:-1] |= filled[:,1:]
+    anchors = adjacent & ~filled
+    if not filled.any():
+        anchors[BOARD_LEN//2, BOARD_LEN//2] = True
+    return anchors
+
+
+def encode_tiles(board):
+    """Return a uint8 tile array for board, tile codes or letter strings."""
+    board = np.asarray(board)
+    if board.dtype == np.uint8:
+        return board.copy()
+    return np.array([[letter_tile(c) for c in row] for row in board],
+                    dtype=np.uint8)
+
+
+# Zobrist keys: one per square for each letter and its blank, and one per
+# rack letter (or blank) for each count held
+ZOBRIST_SEED = 2019
+_zobrist_random = random.Random(ZOBRIST_SEED)
+BOARD_ZOBRIST = [[[_zobrist_random.getrandbits(64)
+                   for _ in range(len(TILE_LETTERS))]
+                  for _ in range(BOARD_LEN)]
+                 for _ in range(BOARD_LEN)]
+RACK_ZOBRIST = [[0] + [_zobrist_random.getrandbits(64) for _ in range(15)]
+                for _ in range(BLANK + 1)]
+_extra_rack_zobrist = {}     # (letter, count): key, past RACK_ZOBRIST
+
+
+def rack_zobrist(letter, count):
+    """
+    Return the Zobrist key of a rack holding count of letter (or blanks).
+    Keys for other characters, or counts RACK_ZOBRIST doesn't cover, are
+    derived from the seed as they are needed.
+    """
+    k = BLANK if letter == WILDCARD else LETTER_INDEX.get(letter)
+    if k is not None and count < len(RACK_ZOBRIST[k]):
+        return RACK_ZOBRIST[k][count]
+    if not count:
+        return 0
+
+    key = _extra_rack_zobrist.get((letter, count))
+    if key is None:
+        key = random.Random(f'{ZOBRIST_SEED}:{letter}:{count}').getrandbits(64)
+        _extra_rack_zobrist[letter, count] = key
+    return key
+
+
+def tile_zobrist(i, j, tile):
+    """Return the Zobrist key of a tile code at i, j."""
+    return BOARD_ZOBRIST[i][j][tile]
+
+
+def board_zobrist(tiles):
+    """Return the Zobrist hashes of tiles and of its transpose."""
+    zobrist, zobrist_t = 0, 0
+    for i in range(BOARD_LEN):
+        for j in range(BOARD_LEN):
+            if tiles[i,j]:
+                zobrist ^= tile_zobrist(i, j, tiles[i,j])
+                zobrist_t ^= tile_zobrist(j, i, tiles[i,j])
+    return zobrist, zobrist_t
+
+
+def counts_mask(counts):
+    """Return the mask of letters (not blanks) with a nonzero count."""
+    mask = 0
+    for k in range(BLANK):
+        if counts[k]:
+            mask |= 1 << k
+    return mask
+
+
+LETTER_MULTIPLIERS = np.array([
+    [3,1,1,1,1,  1,  1,1,1,1,3],
+    [1,1,1,1,1,  1,  1,1,1,1,1],
+    [1,1,3,1,2,  1,  2,1,3,1,1],
+    [1,1,1,3,1,  1,  1,3,1,1,1],
+    [1,1,2,1,1,  1,  1,1,2,1,1],
+
+    [1,1,1,1,1,  1,  1,1,1,1,1],
+
+    [1,1,2,1,1,  1,  1,1,2,1,1],
+    [1,1,1,3,1,  1,  1,3,1,1,1],
+    [1,1,3,1,2,  1,  2,1,3,1,1],
+    [1,1,1,1,1,  1,  1,1,1,1,1],
+    [3,1,1,1,1,  1,  1,1,1,1,3],
+])
+
+WORD_MULTIPLIERS = np.array([
+    [1,1,3,1,1,  1,  1,1,3,1,1],
+    [1,2,1,1,1,  2,  1,1,1,2,1],
+    [3,1,1,1,1,  1,  1,1,1,1,3],
+    [1,1,1,1,1,  1,  1,1,1,1,1],
+    [1,1,1,1,1,  1,  1,1,1,1,1],
+
+    [1,2,1,1,1,  1,  1,1,1,2,1],
+
+    [1,1,1,1,1,  1,  1,1,1,1,1],
+    [1,1,1,1,1,  1,  1,1,1,1,1],
+    [3,1,1,1,1,  1,  1,1,1,1,3],
+    [1,2,1,1,1,  2,  1,1,1,2,1],
+    [1,1,3,1,1,  1,  1,1,3,1,1],
+])
+
+TILE_SCORES = {
+    'a': 1, 'b': 4,  'c': 4, 'd': 2, 'e': 1,
+    'f': 4, 'g': 3,  'h': 3, 'i': 1, 'j': 10,
+    'k': 5, 'l': 2,  'm': 4, 'n': 2, 'o': 1,
+    'p': 4, 'q': 10, 'r': 1, 's': 1, 't': 1,
+    'u': 2, 'v': 5,  'w': 4, 'x': 8, 'y': 3,
+    'z': 10, WILDCARD: 0,
+}
+
+BINGO_BONUS = 35
+
+TILE_BAG = {
+    'a': 5, 'b': 1, 'c': 1, 'd': 2, 'e': 7,
+    'f': 1, 'g': 1, 'h': 1, 'i': 4, 'j': 1,
+    'k': 1, 'l': 2, 'm': 1, 'n': 2, 'o': 4,
+    'p': 1, 'q': 1, 'r': 2, 's': 4, 't': 2,
+    'u': 1, 'v': 1, 'w': 1, 'x': 1, 'y': 1,
+    'z': 1, WILDCARD: 2,
+}
+
+
 class Board:
-    def __init__(self, board=None, tile_bag=None):
+    __slots__ = ('board', 'board_t', 'zobrist', 'zobrist_t',
+                 'row_valid_letters', 'col_valid_letters',
+                 'row_cross_scores', 'col_cross_scores',
+                 'valid_letters_dawg', 'anchors', 'anchors_t', 'tile_bag')
+
+    letter_multipliers = LETTER_MULTIPLIERS
+    word_multipliers = WORD_MULTIPLIERS
+    tile_scores = TILE_SCORES
+
+    def __init__(self, board=None, tile_bag=None, zobrist=None, anchors=None):
         if board is None:
-            self.board = np.full((BOARD_LEN, BOARD_LEN), '')
+            self.board = np.zeros((BOARD_LEN, BOARD_LEN), dtype=np.uint8)
+        else:
+            self.board = encode_tiles(board)
+        self.board_t = self.board.T         # transposed view of the tiles
+
+        # Zobrist hashes of this board and its transpose
+        if zobrist is None:
+            zobrist = board_zobrist(self.board)
+        self.zobrist, self.zobrist_t = zobrist
+
+        # Anchor squares, and the transposed view of them
+        if anchors is None:
+            self.anchors = anchor_mask(self.board)
         else:
-            self.board = np.array(board)
-
-        self.letter_multipliers = np.array([
-            [3,1,1,1,1,  1,  1,1,1,1,3],
-            [1,1,1,1,1,  1,  1,1,1,1,1],
-            [1,1,3,1,2,  1,  2,1,3,1,1],
-            [1,1,1,3,1,  1,  1,3,1,1,1],
-            [1,1,2,1,1,  1,  1,1,2,1,1],
-
-            [1,1,1,1,1,  1,  1,1,1,1,1],
-
-            [1,1,2,1,1,  1,  1,1,2,1,1],
-            [1,1,1,3,1,  1,  1,3,1,1,1],
-            [1,1,3,1,2,  1,  2,1,3,1,1],
-            [1,1,1,1,1,  1,  1,1,1,1,1],
-            [3,1,1,1,1,  1,  1,1,1,1,3],
-        ])
-
-        self.word_multipliers = np.array([
-            [1,1,3,1,1,  1,  1,1,3,1,1],
-            [1,2,1,1,1,  2,  1,1,1,2,1],
-            [3,1,1,1,1,  1,  1,1,1,1,3],
-            [1,1,1,1,1,  1,  1,1,1,1,1],
-            [1,1,1,1,1,  1,  1,1,1,1,1],
-
-            [1,2,1,1,1,  1,  1,1,1,2,1],
-
-            [1,1,1,1,1,  1,  1,1,1,1,1],
-            [1,1,1,1,1,  1,  1,1,1,1,1],
-            [3,1,1,1,1,  1,  1,1,1,1,3],
-            [1,2,1,1,1,  2,  1,1,1,2,1],
-            [1,1,3,1,1,  1,  1,1,3,1,1],
-        ])
+            self.anchors = anchors.copy()
+        self.anchors_t = self.anchors.T
 
+        # Masks of valid letters per square for horizontal (row) and
+        # vertical (col) plays, indexed [i][j] and [j][i] so transpose can
+        # swap them
         self.row_valid_letters = [[]]*BOARD_LEN
+        self.col_valid_letters = [[]]*BOARD_LEN
+        self.valid_letters_dawg = None
 
-        self.tile_scores = {
-            'a': 1, 'b': 4,  'c': 4, 'd': 2, 'e': 1,
-            'f': 4, 'g': 3,  'h': 3, 'i': 1, 'j': 10,
-            'k': 5, 'l': 2,  'm': 4, 'n': 2, 'o': 1,
-            'p': 4, 'q': 10, 'r': 1, 's': 1, 't': 1,
-            'u': 2, 'v': 5,  'w': 4, 'x': 8, 'y': 3,
-            'z': 10, WILDCARD: 0,
-        }
+        # Scores of the tiles crossing each square, kept with (and indexed
+        # like) the valid letters, -1 where no word crosses
+        self.row_cross_scores = [[]]*BOARD_LEN
+        self.col_cross_scores = [[]]*BOARD_LEN
 
         if tile_bag is None:
-            self.tile_bag = {
-                'a': 5, 'b': 1, 'c': 1, 'd': 2, 'e': 7,
-                'f': 1, 'g': 1, 'h': 1, 'i': 4, 'j': 1,
-                'k': 1, 'l': 2, 'm': 1, 'n': 2, 'o': 4,
-                'p': 1, 'q': 1, 'r': 2, 's': 4, 't': 2,
-                'u': 1, 'v': 1, 'w': 1, 'x': 1, 'y': 1,
-                'z': 1, WILDCARD: 2,
-            }
+            self.tile_bag = dict(TILE_BAG)
         else:
             self.tile_bag = tile_bag
             #print('COPIED TILE BAG')
@@ -73,25 +261,31 @@ class Board:
 
     def load(self, board_file):
         with open(board_file,'r') as f:
-            i = 0
-            for line in f.readlines():
-                line = line.strip()
-                if not line:
-                    continue
-
-                for j, letter in enumerate(line.split()):
-                    self.board[i,j] = letter.replace('.', '')
-                i += 1
+            self.load_lines(f)
+
+    def load_lines(self, lines):
+        """Load the board from lines in the board file format."""
+        i = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            for j, letter in enumerate(line.split()):
+                self.board[i,j] = letter_tile(letter.replace('.', ''))
+            i += 1
+        self.zobrist, self.zobrist_t = board_zobrist(self.board)
+        self.anchors = anchor_mask(self.board)
+        self.anchors_t = self.anchors.T
         self.set_tile_bag()
 
     def set_tile_bag(self):
-        for row in self.board:
-            for letter in row:
-                if letter:
-                    ch = letter if letter.islower() else WILDCARD
-                    self.tile_bag[ch] -= 1
-                    if self.tile_bag[ch] < 0:
-                        print(f"Too many of '{ch}' on board.")
+        for tile in self.board.flat:
+            if tile:
+                ch = WILDCARD if tile & BLANK_TILE else TILE_LETTERS[tile]
+                self.tile_bag[ch] -= 1
+                if self.tile_bag[ch] < 0:
+                    print(f"Too many of '{ch}' on board.")
 
     def remove_letters(self, letters):
         for letter in letters:
@@ -125,7 +319,17 @@ class Board:
         return sel
 
     def transpose(self, recalc=False, dawg=None):
-        tboard = Board(board=self.board.T, tile_bag=self.tile_bag)
+        """Return the transposed board, which shares this board's tiles."""
+        tboard = Board.__new__(Board)
+        tboard.board, tboard.board_t = self.board_t, self.board
+        tboard.zobrist, tboard.zobrist_t = self.zobrist_t, self.zobrist
+        tboard.row_valid_letters = self.col_valid_letters
+        tboard.col_valid_letters = self.row_valid_letters
+        tboard.row_cross_scores = self.col_cross_scores
+        tboard.col_cross_scores = self.row_cross_scores
+        tboard.valid_letters_dawg = self.valid_letters_dawg
+        tboard.anchors, tboard.anchors_t = self.anchors_t, self.anchors
+        tboard.tile_bag = self.tile_bag
         if recalc:
             tboard.calc_row_valid_letters(dawg)
 
@@ -133,101 +337,162 @@ class Board:
 
     def get_word_below(self, i, j):
         """Return the word below i, j on the board."""
-        i += 1
-        word = []
-        while i < BOARD_LEN and self.board[i,j]:
-            word.append(self.board[i,j])
-            i += 1
-        return ''.join(word)
+        return _get_word_below(self.board, i, j)
 
     def get_word_above(self, i, j):
         """Return the word above i, j on the board."""
-        i -= 1
-        word = []
-        while i > 0 and self.board[i,j]:
-            word.insert(0, self.board[i,j])
-            i -= 1
-        return ''.join(word)
+        return _get_word_above(self.board, i, j)
 
 
     def get_row_valid_letters(self, lex_dawg, i):
         """
-        Return the valid letters for each position on a row, depending on
-        the surrounding tiles.
+        Return masks of the valid letters for each position on a row,
+        depending on the surrounding tiles.
         """
-        valid_letters = []
-        for j in range(BOARD_LEN):
-            valid_letters.append([])
-
-            # Letter on this spot
-            if self.board[i,j]:
-                valid_letters[j] = [self.board[i,j].lower()]
-
-            # Nothing above or below
-            elif (i-1 < 0 or not self.board[i-1,j]) \
-               and (i+1 == BOARD_LEN or not self.board[i+1, j]):
-                valid_letters[j] = all_letters
+        return [_get_valid_letters(self.board, lex_dawg, i, j)
+                for j in range(BOARD_LEN)]
 
-
-            # At top edge or nothing above, consider word below only
-            elif i-1 < 0 or not self.board[i-1,j]:
-                word = self.get_word_below(i,j).lower()
-                for letter in all_letters:
-                    if letter + word in lex_dawg:
-                        valid_letters[j].append(letter)
-
-            # At bottom edge or nothing below, consider word above only
-            elif i+1 == BOARD_LEN or not self.board[i+1, j]:
-                word = self.get_word_above(i,j).lower()
-                for letter in all_letters:
-                    if word + letter in lex_dawg:
-                        valid_letters[j].append(letter)
-
-            # Words both above and below
-            else:
-                above = self.get_word_above(i,j).lower()
-                below = self.get_word_below(i,j).lower()
-                for letter in all_letters:
-                    if above + letter + below in lex_dawg:
-                        valid_letters[j].append(letter)
-
-        return [''.join(l) for l in valid_letters]
+    def get_col_valid_letters(self, lex_dawg, j):
+        """
+        Return masks of the valid letters for each position on a column for
+        vertical plays, depending on the tiles to either side.
+        """
+        return [_get_valid_letters(self.board_t, lex_dawg, j, i)
+                for i in range(BOARD_LEN)]
 
     def calc_row_valid_letters(self, lex_dawg):
-        for i, row in enumerate(self.board):
-            self.row_valid_letters[i] = self.get_row_valid_letters(lex_dawg, i)
-
-    def add_word(self, play, rack=None):
+        """Calculate valid letters for both horizontal and vertical plays."""
+        self.row_valid_letters = [self.get_row_valid_letters(lex_dawg, i)
+                                  for i in range(BOARD_LEN)]
+        self.col_valid_letters = [self.get_col_valid_letters(lex_dawg, j)
+                                  for j in range(BOARD_LEN)]
+        self.row_cross_scores = [[_get_cross_score(self.board, i, j)
+                                  for j in range(BOARD_LEN)]
+                                 for i in range(BOARD_LEN)]
+        self.col_cross_scores = [[_get_cross_score(self.board_t, j, i)
+                                  for i in range(BOARD_LEN)]
+                                 for j in range(BOARD_LEN)]
+        self.valid_letters_dawg = lex_dawg
+
+    def ensure_valid_letters(self, lex_dawg):
+        """Calculate valid letters unless they are current for lex_dawg."""
+        if self.valid_letters_dawg is not lex_dawg:
+            self.calc_row_valid_letters(lex_dawg)
+
+    def _update_valid_letters(self, lex_dawg, placed):
+        """
+        Update valid letters and cross scores after placing tiles at the
+        (i, j) squares in placed, all on one row. Only the placed squares and
+        the open squares at the ends of the words through them can change.
+        """
+        self.row_valid_letters = [row[:] for row in self.row_valid_letters]
+        self.col_valid_letters = [col[:] for col in self.col_valid_letters]
+        self.row_cross_scores = [row[:] for row in self.row_cross_scores]
+        self.col_cross_scores = [col[:] for col in self.col_cross_scores]
+
+        for i, j in placed:
+            mask = tile_mask(self.board[i,j])
+            self.row_valid_letters[i][j] = mask
+            self.col_valid_letters[j][i] = mask
+            self.row_cross_scores[i][j] = -1
+            self.col_cross_scores[j][i] = -1
+
+            # Ends of the vertical word through the new tile
+            for k in _gen_word_ends(self.board[:,j], i):
+                self.row_valid_letters[k][j] = \
+                    _get_valid_letters(self.board, lex_dawg, k, j)
+                self.row_cross_scores[k][j] = \
+                    _get_cross_score(self.board, k, j)
+
+        # Ends of the horizontal word along the row
+        i, j = placed[0]
+        for k in _gen_word_ends(self.board[i], j):
+            self.col_valid_letters[k][i] = \
+                _get_valid_letters(self.board_t, lex_dawg, k, i)
+            self.col_cross_scores[k][i] = \
+                _get_cross_score(self.board_t, k, i)
+
+    def add_word(self, play, rack=None, lex_dawg=None):
         """
         Returns a copy of self with the given word added.
         If rack is given, removes the played letters from rack.
+        If lex_dawg is given, valid letters are updated for the new tiles
+        rather than recalculated for the whole board.
         """
         if play.vertical:
             hplay = copy.copy(play)
             hplay.vertical = False
-            return self.transpose().add_word(hplay, rack).transpose()
+            return self.transpose().add_word(hplay, rack, lex_dawg).transpose()
         played_letters = []
+        placed = []
 
         word = play.word
         i, j = play.i, play.j
-        new_board = Board(board=self.board, tile_bag=self.tile_bag)
-
-        while word:
-            if not new_board.board[i, j+len(word)-1]:
-                played_letters.append(word[-1])
-                new_board.board[i, j + len(word)-1] = word[-1]
-
-            word = word[:-1]
+        new_board = Board(board=self.board, tile_bag=self.tile_bag,
+                          zobrist=(self.zobrist, self.zobrist_t),
+                          anchors=self.anchors)
+
+        for k, letter in enumerate(word):
+            if not new_board.board[i, j+k]:
+                tile = letter_tile(letter)
+                played_letters.append(letter)
+                placed.append((i, j+k))
+                new_board.board[i, j+k] = tile
+                new_board.zobrist ^= tile_zobrist(i, j+k, tile)
+                new_board.zobrist_t ^= tile_zobrist(j+k, i, tile)
 
         if rack:
             rack.remove_letters(played_letters)
 
+        if self.board.any():
+            new_board._update_anchors(placed)
+        else:
+            new_board.anchors[:] = anchor_mask(new_board.board)
+
+        if lex_dawg is not None and self.valid_letters_dawg is lex_dawg:
+            new_board.row_valid_letters = self.row_valid_letters
+            new_board.col_valid_letters = self.col_valid_letters
+            new_board.row_cross_scores = self.row_cross_scores
+            new_board.col_cross_scores = self.col_cross_scores
+            new_board.valid_letters_dawg = lex_dawg
+            if placed:
+                new_board._update_valid_letters(lex_dawg, placed)
+        elif lex_dawg is not None:
+            new_board.calc_row_valid_letters(lex_dawg)
+
         return new_board
 
+    def _update_anchors(self, placed):
+        """Update the anchors around tiles newly placed at placed."""
+        for i, j in placed:
+            self.anchors[i,j] = False
+            for adj_i, adj_j in gen_adjacent_spots(i, j):
+                if not self.board[adj_i, adj_j]:
+                    self.anchors[adj_i, adj_j] = True
+
     def _score_existing_word(self, word):
         return sum([self.tile_scores[letter] for letter in word if letter.islower()])
 
 
+    def get_row_scoring(self, i):
+        """
+        Return (tile_score, letter_mult, word_mult, cross_score) for each
+        square of row i, for scoring horizontal plays as they are built.
+        Placed squares have the score of their tile (0 for a blank); open
+        squares have 0 and their multipliers. Cross scores must be current.
+        """
+        scoring = []
+        for j, tile in enumerate(self.board[i]):
+            if tile:
+                scoring.append((TILE_SCORES.get(TILE_LETTERS[tile], 0),
+                                1, 1, -1))
+            else:
+                scoring.append((0,
+                                int(self.letter_multipliers[i,j]),
+                                int(self.word_multipliers[i,j]),
+                                self.row_cross_scores[i][j]))
+        return scoring
+
     def score_word(self, word, startpos):
         orig_word = word
         ai, aj = startpos
@@ -249,7 +514,7 @@ class Board:
                 letter_mult = self.letter_multipliers[i,j]
                 word_mult = self.word_multipliers[i,j]
             else:
-                letter = self.board[i,j]
+                letter = TILE_LETTERS[self.board[i,j]]
             myword_multiplier *= word_mult
 
             # Score of this individual letter
@@ -274,36 +539,119 @@ class Board:
             word = word[:-1]
 
         score += myword_score * myword_multiplier
-        if tiles_placed == 7:
-            score += 35
+        if tiles_placed == RACK_TILES:
+            score += BINGO_BONUS
 
         return score
 
     def __str__(self):
         """String representation. Fills all empty spots for better formatting."""
         board = np.array(
-            [[c if c else '.' for c in row] for row in self.board]
+            [[TILE_LETTERS[c] or '.' for c in row] for row in self.board]
         )
         return str(board)
 
 
+def _get_word_below(tiles, i, j):
+    i += 1
+    word = []
+    while i < BOARD_LEN and tiles[i,j]:
+        word.append(TILE_LETTERS[tiles[i,j]])
+        i += 1
+    return ''.join(word)
+
+
+def _get_word_above(tiles, i, j):
+    i -= 1
+    word = []
+    while i >= 0 and tiles[i,j]:
+        word.insert(0, TILE_LETTERS[tiles[i,j]])
+        i -= 1
+    return ''.join(word)
+
+
+def _gen_word_ends(line, k):
+    """Yield the open squares just before and after the tiles through k."""
+    start = k
+    while start > 0 and line[start-1]:
+        start -= 1
+    if start > 0:
+        yield start - 1
+
+    end = k
+    while end < BOARD_LEN - 1 and line[end+1]:
+        end += 1
+    if end < BOARD_LEN - 1:
+        yield end + 1
+
+
+def _get_cross_score(tiles, i, j):
+    """
+    Return the score of the tiles above and below an open square i, j of
+    tiles, or -1 if the square is taken or no tiles cross it.
+    """
+    if tiles[i,j]:
+        return -1
+
+    crossing = _get_word_above(tiles, i, j) + _get_word_below(tiles, i, j)
+    if not crossing:
+        return -1
+    return sum(TILE_SCORES.get(letter, 0) for letter in crossing)
+
+
+def _get_valid_letters(tiles, lex_dawg, i, j):
+    """
+    Return the mask of valid letters for a horizontal play at i, j of tiles,
+    depending on the tiles above and below.
+    """
+    # Letter on this spot
+    if tiles[i,j]:
+        return tile_mask(tiles[i,j])
+
+    above = _get_word_above(tiles, i, j).lower()
+    below = _get_word_below(tiles, i, j).lower()
+
+    # Nothing above or below
+    if not above and not below:
+        return ALL_LETTERS_MASK
+
+    return lex_dawg.valid_letters_mask(above, below)
+
+
 class Rack:
+    __slots__ = ('letters', 'zobrist')
+
     def __init__(self, letters=''):
-        self.letters = [c for c in letters]
+        self.letters = []
+        self.zobrist = 0        # Zobrist hash of the letter counts
+        self.add_letters(letters)
 
     def __str__(self):
         return ''.join(self.letters)
 
+    def _update_zobrist(self, letter, delta):
+        count = self.letters.count(letter)
+        self.zobrist ^= rack_zobrist(letter, count) ^ \
+            rack_zobrist(letter, count - delta)
+
+    def add_letters(self, letters):
+        for letter in letters:
+            self.letters.append(letter)
+            self._update_zobrist(letter, 1)
+
     def remove_letters(self, letters):
         for letter in letters:
             if letter.isupper():
                 letter = WILDCARD
             self.letters.remove(letter)
+            self._update_zobrist(letter, -1)
 
     def draw_from_board(self, board, max_tiles=RACK_TILES):
-        self.letters.extend(board.draw_tiles(max_tiles - len(self.letters)))
+        self.add_letters(board.draw_tiles(max_tiles - len(self.letters)))
 
 class Play :
+    __slots__ = ('word', 'i', 'j', 'score', 'vertical', 'remaining')
+
     def __init__(self, word='', i=0, j=0, score=0, vertical=None, remaining=None):
         self.word = word
         self.i = i
@@ -0,0 +1,107 @@
+"""
+Client for a solver server (see server.py). `wwfsolve <board_file>
+<letters> [<dictionary>] [--gaddag] --server[=<address>]
+[--deadline=<seconds>]` sends the position to a running wwfserver instead of
+solving it here, so it skips loading numpy, the lexicon and a worker pool.
+Without --server, wwfsolve solves locally as before.
+
+Requests and responses are JSON objects, one per line, as in wwfbatch.
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+
+if hasattr(socket, 'AF_UNIX'):
+    DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(),
+                                   f'wwfsolve-{os.getuid()}.sock')
+else:
+    DEFAULT_ADDRESS = 'localhost:8577'
+
+
+def parse_address(address):
+    """
+    Return (host, port) for a host:port address, or None for a Unix socket
+    path.
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and os.sep not in address:
+        return host or 'localhost', int(port)
+    return None
+
+
+def connect(address=DEFAULT_ADDRESS, timeout=None):
+    tcp_address = parse_address(address)
+    if tcp_address is not None:
+        return socket.create_connection(tcp_address, timeout)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+
+def request(message, address=DEFAULT_ADDRESS, timeout=None):
+    """Send one request to the server at address, returning its response."""
+    with connect(address, timeout) as sock:
+        sock.sendall(json.dumps(message).encode('utf8') + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError(f'No response from solver server {address}.')
+    return json.loads(line)
+
+
+def format_play(play):
+    direction = 'down' if play['vertical'] else 'across'
+    return (f"\"{play['word']}\": ({play['row']},{play['col']}) {direction}, "
+            f"{play['score']}pts")
+
+
+def main():
+    """wwfsolve: solve on a server with --server, else locally."""
+    server_args = [arg for arg in sys.argv[1:]
+                   if arg.split('=', 1)[0] in ('--server', '--deadline')]
+    if not any(arg.startswith('--server') for arg in server_args):
+        from .solver import solve_board_cli
+        return solve_board_cli()
+
+    options = dict((arg.split('=', 1) + [None])[:2] for arg in server_args)
+    gaddag = '--gaddag' in sys.argv
+    argv = [arg for arg in sys.argv
+            if arg not in server_args and arg != '--gaddag']
+    if len(argv) < 3:
+        print('USAGE: wwfsolve <board_file> <letters> [<dictionary>] '
+              '[--gaddag] --server[=<address>] [--deadline=<seconds>]')
+        print(f' - address is a Unix socket path or host:port, default '
+              f'{DEFAULT_ADDRESS}')
+        exit(0)
+
+    with open(argv[1].strip()) as f:
+        message = {'board': f.read(), 'rack': argv[2].strip()}
+    if len(argv) > 3:
+        message['dictionary'] = argv[3]
+    if gaddag:
+        message['gaddag'] = True
+    if options.get('--deadline'):
+        message['deadline'] = float(options['--deadline'])
+
+    address = options['--server'] or DEFAULT_ADDRESS
+    try:
+        response = request(message, address)
+    except OSError as e:
+        print(f'Could not reach solver server {address}: {e}')
+        print(' - start one with wwfserver')
+        exit(1)
+
+    if 'error' in response:
+        print(f"Error: {response['error']}")
+        exit(1)
+    print(f"Solving board with letters: {message['rack']}...")
+    for play in reversed(response['plays']):
+        print(format_play(play))
+
+
+if __name__ == '__main__':
+    main()
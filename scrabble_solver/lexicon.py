@@ -0,0 +1,350 @@
+"""
+Lexicon artifacts built from the dictionaries: the DAWG, the GADDAG and the
+anagram index. A manifest next to them records the LEXICON_VERSION, a hash
+of the dictionary files and a hash of each artifact, so artifacts built from
+other dictionaries or by another version are rebuilt rather than used.
+Build them ahead of time with `wwflex [<dictionary> ...] [--force]`.
+"""
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import sys
+
+from dawg import CompletionDAWG
+
+from .anagram import AnagramIndex
+from .scrabble_dawg import ScrabbleDAWG, ScrabbleGADDAG, gen_gaddag_strings
+
+# Bump when an artifact's format or contents change
+LEXICON_VERSION = 1
+
+dirname = os.path.dirname(__file__)
+DICTS_PATH = os.path.join(dirname, 'dictionaries')
+DAWGS_PATH = os.path.join(dirname, 'dawgs')
+
+# name: (dictionary files, relative to DICTS_PATH, plain or gzipped,
+#        artifact name)
+DICTIONARIES = {
+    'enable': (('enable2k.txt', 'wwf_additions.txt'), 'wwf'),
+    'sowpods': (('sowpods.txt',), 'sowpods'),
+    'sowpods_gz': ((os.path.join(os.pardir, 'sowpods.txt.gz'),),
+                   'sowpods_gz'),
+    'comb': (('enable2k.txt', 'wwf_additions.txt', 'sowpods.txt'),
+             'combined'),
+}
+DEFAULT_DICTIONARY = 'enable'
+
+
+def get_dictionary(name=DEFAULT_DICTIONARY):
+    """
+    Return the (dictionary_files, dawg_file) for a named dictionary:
+    enable (default), sowpods, sowpods_gz (the gzipped list shipped with
+    the package), or comb.
+    """
+    if name not in DICTIONARIES:
+        raise ValueError(f"Unknown dictionary '{name}', expected one of "
+                         f"{', '.join(DICTIONARIES)}.")
+    files, artifact_name = DICTIONARIES[name]
+    return (tuple(os.path.normpath(os.path.join(DICTS_PATH, f))
+                  for f in files),
+            os.path.join(DAWGS_PATH, artifact_name + '.dawg'))
+
+
+def _open_words(dictionary_file):
+    if dictionary_file.endswith('.gz'):
+        return gzip.open(dictionary_file, 'rt')
+    return open(dictionary_file, 'r')
+
+
+def _gen_file_words(dictionary_file):
+    """Generate the words of a dictionary file, one per line, as read."""
+    with _open_words(dictionary_file) as f:
+        for line in f:
+            word = line.strip()
+            if word:
+                yield word
+
+
+def _gen_sorted_words(dictionary_file):
+    """
+    Generate the words of a dictionary file in sorted order, streaming it
+    if it is sorted already (checked by reading it once) and sorting it in
+    memory otherwise.
+    """
+    last = ''
+    for word in _gen_file_words(dictionary_file):
+        if word < last:
+            yield from sorted(_gen_file_words(dictionary_file))
+            return
+        last = word
+    yield from _gen_file_words(dictionary_file)
+
+
+def gen_words(dictionary_files):
+    """
+    Generate the words of dictionary_files, plain or gzipped with one word
+    per line, once each in sorted order. The files are merged as they are
+    read rather than loaded together.
+    """
+    last = None
+    for word in heapq.merge(*[_gen_sorted_words(dictionary_file)
+                              for dictionary_file in dictionary_files]):
+        if word != last:
+            yield word
+            last = word
+
+
+def get_words(dictionary_files):
+    return list(gen_words(dictionary_files))
+
+
+def _save_dawg(dictionary_files, path):
+    CompletionDAWG(gen_words(dictionary_files),
+                   input_is_sorted=True).save(path)
+
+
+def _save_gaddag(dictionary_files, path):
+    CompletionDAWG(sorted(s for word in gen_words(dictionary_files)
+                          for s in gen_gaddag_strings(word)),
+                   input_is_sorted=True).save(path)
+
+
+def _save_anagrams(dictionary_files, path):
+    AnagramIndex(gen_words(dictionary_files)).save(path)
+
+
+# kind: (file extension, builder, class loading it)
+ARTIFACTS = {
+    'dawg': ('.dawg', _save_dawg, ScrabbleDAWG),
+    'gaddag': ('.gaddag', _save_gaddag, ScrabbleGADDAG),
+    'anagrams': ('.anagrams', _save_anagrams, AnagramIndex),
+}
+
+
+def _replace_via_tmp(path, write):
+    """
+    Call write with a temp file name next to path, then move the file into
+    place. The name is per process, as several can build the same file at
+    once, and the temp file is removed if write fails.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def _hash_files(paths):
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+    return sha.hexdigest()
+
+
+class Lexicon:
+    """
+    The artifacts for dictionary_files, named after dawg_file. Each is
+    loaded on first use, and built first if it is missing or stale.
+    """
+    def __init__(self, dictionary_files, dawg_file):
+        self.dictionary_files = tuple(dictionary_files)
+        self.base = os.path.splitext(dawg_file)[0]
+        self.manifest_file = self.base + '.manifest.json'
+        self._sources_hash = None
+        self._hashed_stats = None   # source stats when _sources_hash was taken
+        self._loaded = {}
+
+    def path(self, kind):
+        return self.base + ARTIFACTS[kind][0]
+
+    @property
+    def sources_hash(self):
+        """
+        Hash of the dictionary files' contents, in order, taken again if
+        they changed size or mtime since.
+        """
+        stats = self.get_source_stats()
+        if self._sources_hash is None or stats != self._hashed_stats:
+            self._sources_hash = _hash_files(self.dictionary_files)
+            self._hashed_stats = stats
+        return self._sources_hash
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_file) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != LEXICON_VERSION:
+            return {}
+        return manifest
+
+    def get_source_stats(self):
+        """The (size, mtime) of each dictionary file."""
+        stats = [os.stat(f) for f in self.dictionary_files]
+        return [[stat.st_size, stat.st_mtime_ns] for stat in stats]
+
+    def is_stale(self, kind, manifest=None, verify=False):
+        """
+        Return whether the kind artifact is missing or was not built from
+        the current dictionaries by this version. The dictionaries are only
+        hashed if they changed size or mtime since the build. With verify,
+        they are always hashed, and so is the artifact, not just its size
+        checked.
+        """
+        if manifest is None:
+            manifest = self.read_manifest()
+        entry = manifest.get('artifacts', {}).get(kind)
+        path = self.path(kind)
+        if (entry is None or not os.path.isfile(path) or
+                os.path.getsize(path) != entry['size']):
+            return True
+        if (verify or entry.get('source_stats') != self.get_source_stats()) \
+                and entry['sources'] != self.sources_hash:
+            return True
+        return verify and _hash_files((path,)) != entry['sha256']
+
+    def get_stale(self, kinds=tuple(ARTIFACTS), verify=False):
+        manifest = self.read_manifest()
+        return [kind for kind in kinds
+                if self.is_stale(kind, manifest, verify)]
+
+    def build(self, kinds=tuple(ARTIFACTS)):
+        """
+        Build the kinds of artifacts, each streaming the dictionaries into
+        its builder, recording them in the manifest.
+        """
+        os.makedirs(os.path.dirname(self.base), exist_ok=True)
+
+        manifest = self.read_manifest() or \
+            {'version': LEXICON_VERSION, 'artifacts': {}}
+        manifest['dictionaries'] = [os.path.basename(f)
+                                    for f in self.dictionary_files]
+        for kind in kinds:
+            path = self.path(kind)
+            _replace_via_tmp(path, lambda tmp_path: ARTIFACTS[kind][1](
+                self.dictionary_files, tmp_path))
+            if issubclass(ARTIFACTS[kind][2], ScrabbleDAWG):
+                # Export its child table now rather than on first load
+                ARTIFACTS[kind][2]().load(path)
+            manifest['artifacts'][kind] = {
+                'file': os.path.basename(path),
+                'sources': self.sources_hash,
+                'source_stats': self.get_source_stats(),
+                'size': os.path.getsize(path),
+                'sha256': _hash_files((path,)),
+            }
+            self._loaded.pop(kind, None)
+
+        _replace_via_tmp(self.manifest_file,
+                         lambda tmp_path: _write_json(manifest, tmp_path))
+
+    def ensure(self, kinds=tuple(ARTIFACTS), verify=False):
+        """Rebuild whichever of the kinds of artifacts are stale."""
+        stale = self.get_stale(kinds, verify)
+        if stale:
+            self.build(stale)
+        return stale
+
+    def load(self, kind):
+        if kind not in self._loaded:
+            self.ensure((kind,))
+            self._loaded[kind] = ARTIFACTS[kind][2]().load(self.path(kind))
+        return self._loaded[kind]
+
+    @property
+    def dawg(self):
+        return self.load('dawg')
+
+    @property
+    def gaddag(self):
+        return self.load('gaddag')
+
+    @property
+    def anagrams(self):
+        return self.load('anagrams')
+
+
+_lexicons = {}
+
+def get_lexicon(dictionary_files, dawg_file):
+    """Return the (shared) Lexicon for dictionary_files and dawg_file."""
+    key = (tuple(dictionary_files), os.path.splitext(dawg_file)[0])
+    if key not in _lexicons:
+        _lexicons[key] = Lexicon(dictionary_files, dawg_file)
+    return _lexicons[key]
+
+
+def save_lex_dawg(dictionary_files=('dictionaries/sowpods.txt',),
+                  outfile=os.path.join(DAWGS_PATH, 'sowpods.dawg'),
+                  gaddag=False):
+    """Build a DAWG (or GADDAG) to outfile, outside of any manifest."""
+    os.makedirs(os.path.dirname(outfile), exist_ok=True)
+    if gaddag:
+        _save_gaddag(dictionary_files, outfile)
+    else:
+        _save_dawg(dictionary_files, outfile)
+
+
+def load_lex_dawg(dictionary_files=('dictionaries/sowpods.txt',),
+                  dawg_file=os.path.join(DAWGS_PATH, 'tmp.dawg'),
+                  gaddag=False):
+    """
+    Load the lexicon for dictionary_files, building dawg_file if missing or
+    stale. With gaddag, a ScrabbleGADDAG is loaded from the .gaddag file
+    next to dawg_file instead, which the solver then uses for move
+    generation.
+    """
+    lexicon = get_lexicon(dictionary_files, dawg_file)
+    return lexicon.gaddag if gaddag else lexicon.dawg
+
+
+def get_anagram_file(dawg_file):
+    """Return the anagram index file kept next to dawg_file."""
+    return os.path.splitext(dawg_file)[0] + ARTIFACTS['anagrams'][0]
+
+
+def load_anagram_index(dictionary_files=('dictionaries/sowpods.txt',),
+                       dawg_file=os.path.join(DAWGS_PATH, 'tmp.dawg')):
+    """
+    Load the AnagramIndex built alongside dawg_file for dictionary_files,
+    building it if missing or stale.
+    """
+    return get_lexicon(dictionary_files, dawg_file).anagrams
+
+
+def main():
+    force = '--force' in sys.argv
+    names = [arg for arg in sys.argv[1:] if arg != '--force']
+    if not names:
+        names = [DEFAULT_DICTIONARY]
+    if any(name not in DICTIONARIES for name in names):
+        print('USAGE: wwflex [<dictionary> ...] [--force]')
+        print(f" - Available dictionaries: {', '.join(DICTIONARIES)}")
+        print(' - --force rebuilds artifacts even if they are up to date')
+        exit(0)
+
+    for name in names:
+        lexicon = get_lexicon(*get_dictionary(name))
+        stale = list(ARTIFACTS) if force else lexicon.get_stale(verify=True)
+        if stale:
+            lexicon.build(stale)
+        for kind in ARTIFACTS:
+            status = 'built' if kind in stale else 'up to date'
+            print(f'{name:>10} {kind:>8}: {lexicon.path(kind)} {status}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,147 +1,155 @@
-import os
 import sys
-from pprint import pprint
-
-from .solver import (
-    load_lex_dawg,
-    get_words,
-    DICTS_PATH,
-    DAWGS_PATH,
+from multiprocessing import Pool
+
+from .anagram import AnagramIndex
+from .lexicon import (
+    DICTIONARIES,
+    gen_words,
+    get_anagram_file,
+    get_dictionary,
+    load_anagram_index,
 )
 
+WORDCUBE_LENGTHS = range(5, 10)
+WORDCUBE_MIN_LEN = 4
+CHUNK_SIZE = 500
+
+
 def get_words_of_len(n, dictionary_files):
-    words = []
-    for dictionary_file in dictionary_files:
-        with open(dictionary_file) as f:
-            for line in f.readlines():
-                word = line.strip()
-                if len(word) == n:
-                    words.append(word)
-    return list(set(words))
+    return [word for word in gen_words(dictionary_files) if len(word) == n]
+
+
+def get_signatures_of_len(n, index):
+    """
+    Return the signatures of the n-letter words in the AnagramIndex index,
+    ordered by their alphabetically first word.
+    """
+    sigs = [(min(words), sig) for sig, words in index.words.items()
+            if len(sig) == n]
+    sigs.sort()
+    return [sig for _, sig in sigs]
 
 
-def _get_highest_nperms(n, words, dawg):
+def _get_highest_nperms(n, index):
     """
     Get the permutations for the set of letters of length n with the
     highest number of valid word permutations.
     """
     best = (None, 0, [])    # word, num perms, nperms
-
-    words_counted = 0
-    total_perms_counted = 0
-
-    for word in words:
-        words_counted += 1
-        # Generate all n-length permutations of word
-        nperms = [w for w in dawg.gen_completions('', word)]
-        total_perms_counted += len(nperms)
-
-        nperms = [w for w in nperms if len(w) == n]
-
-        for nperm in nperms:
-            try:
-                words.remove(nperm)
-            except ValueError:
-                pass
-
-        nperms = list(set(nperms))
-
+    for sig in get_signatures_of_len(n, index):
+        nperms = index.words[sig]
         if len(nperms) > best[1]:
-            best = (word, len(nperms), nperms)
-
-    print(f'words permuted: {words_counted}')
-    print(f'total permutations: {total_perms_counted}')
+            best = (min(nperms), len(nperms), sorted(nperms))
     return best
 
+
 def sort_word_by_len_lex(word):
-    # TODO make lex sort secondary
-    return len(word)
+    """Longest words first, then alphabetically."""
+    return (-len(word), word)
 
 
-def _get_hardest_wordcube(n, words, dawg):
+def get_wordcube(sig, index):
     """
-    Get the permutations for the set of letters of length n with the
-    highest number of valid word permutations.
+    Return (word, letter, num perms, perms) for the letters of sig: the
+    required letter giving the most words of WORDCUBE_MIN_LEN or more made
+    from sig, and those words.
     """
-    best = (None, None, 0, [])    # word, num perms, nperms
+    perms = list(index.gen_subanagrams(sig, min_len=WORDCUBE_MIN_LEN))
+    best = (min(index.words[sig]), None, 0, [])
+    for letter in sorted(set(sig)):
+        req_perms = [perm for perm in perms if letter in perm]
+        if len(req_perms) > best[2]:
+            best = (best[0], letter, len(req_perms), req_perms)
+    return best
 
-    words_counted = 0
-    total_perms_counted = 0
 
-    for word in words:
-        words_counted += 1
-        # Generate all n-length permutations of word
-        perms = [w for w in dawg.gen_completions('', word)]
-        total_perms_counted += len(perms)
-        perms = set(perms)
+_worker_index = None
 
-        # generate perm sets with required letter
-        letters = set(word)
-        for letter in letters:
-            req_perms = [perm for perm in perms if len(perm) > 3 and letter in perm]
-            if len(req_perms) > best[2]:
-                best = (word, letter, len(req_perms), req_perms)
+def _init_worker(anagram_file):
+    """Pool initializer, loads the anagram index once per worker process."""
+    global _worker_index
+    _worker_index = AnagramIndex().load(anagram_file)
 
-        # remove nperms for this word
-        nperms = [w for w in perms if len(w) == n]
-        for nperm in nperms:
-            try:
-                words.remove(nperm)
-            except ValueError:
-                pass
 
-        #nperms = list(set(nperms))
+def _get_hardest_wordcube_chunk(chunk_id, sigs):
+    """Return (chunk_id, num sigs, best wordcube) for a chunk of sigs."""
+    best = (None, None, 0, [])
+    for sig in sigs:
+        wordcube = get_wordcube(sig, _worker_index)
+        if wordcube[2] > best[2]:
+            best = wordcube
+    return chunk_id, len(sigs), best
 
-        #if len(nperms) > best[1]:
-        #    best = (word, len(nperms), nperms)
 
-    print(f'words permuted: {words_counted}')
-    print(f'total perms counted: {total_perms_counted}')
+def _starcall(args):
+    return _get_hardest_wordcube_chunk(*args)
 
-    # sort words
-    best[-1].sort(key=sort_word_by_len_lex, reverse=True)
 
-    return best
+def gen_hardest_wordcubes(lengths, dictionary_files, dawg_file,
+                          processes=None, progress=sys.stderr):
+    """
+    Generate (n, wordcube) with the hardest wordcube for each word length
+    in lengths. Each set of letters is checked once, however many words it
+    spells, in chunks across a pool of processes. Progress is written to
+    progress as chunks finish.
+    """
+    index = load_anagram_index(dictionary_files, dawg_file)
+    with Pool(processes, initializer=_init_worker,
+              initargs=(get_anagram_file(dawg_file),)) as pool:
+        for n in lengths:
+            sigs = get_signatures_of_len(n, index)
+            chunks = [(chunk_id, sigs[k:k + CHUNK_SIZE])
+                      for chunk_id, k in enumerate(range(0, len(sigs),
+                                                         CHUNK_SIZE))]
+            print(f'Generating wordcube for length {n}: '
+                  f'checking {len(sigs)} letter sets.', file=progress)
+
+            # Ties go to the first letter set, as checked in order
+            best_id, best = len(chunks), (None, None, 0, [])
+            checked = 0
+            for chunk_id, num_sigs, wordcube in pool.imap_unordered(_starcall,
+                                                                    chunks):
+                checked += num_sigs
+                print(f'  length {n}: {checked}/{len(sigs)} letter sets',
+                      file=progress, flush=True)
+                if (wordcube[2], -chunk_id) > (best[2], -best_id):
+                    best_id, best = chunk_id, wordcube
+
+            best[-1].sort(key=sort_word_by_len_lex)
+            yield n, best
 
 
 def get_highest_nperms(n, dictionary_files, dawg_file):
-    dawg = load_lex_dawg(dictionary_files, dawg_file)
-    words = get_words_of_len(n, dictionary_files)
+    index = load_anagram_index(dictionary_files, dawg_file)
+    return _get_highest_nperms(n, index)
 
 
 def get_hardest_wordcube(n, dictionary_files, dawg_file):
-    dawg = load_lex_dawg(dictionary_files, dawg_file)
-    words = get_words_of_len(n, dictionary_files)
-    words.sort()
-    print(f'Generating wordcube for length {n}: checking {len(words)} words.')
-
-    return _get_hardest_wordcube(n, words, dawg)
+    for _, wordcube in gen_hardest_wordcubes((n,), dictionary_files,
+                                             dawg_file):
+        return wordcube
 
 
 def main():
     if len(sys.argv) < 2:
-        print('USAGE: perm_count word_length [dictionary]')
+        print('USAGE: perm_count <word_length>|all [dictionary]')
+        print(f' - all checks lengths {WORDCUBE_LENGTHS.start}-'
+              f'{WORDCUBE_LENGTHS.stop - 1}')
+        print(f" - Available dictionaries: {', '.join(DICTIONARIES)}")
         exit()
 
-    n = int(sys.argv[1].strip())
-
-    dictionary_files = (os.path.join(DICTS_PATH, 'enable2k.txt'),
-                        os.path.join(DICTS_PATH, 'wwf_additions.txt'))
-    dawg_file = os.path.join(DAWGS_PATH, 'wwf.dawg')
-    try:
-        dictionary = sys.argv[3]
-        if dictionary == 'sowpods':
-            dictionary_files = (os.path.join(DICTS_PATH, 'sowpods.txt'),)
-            dawg_file = os.path.join(DAWGS_PATH, 'sowpods.dawg')
-        if dictionary == 'comb':
-            dictionary_files += (os.path.join(DICTS_PATH, 'sowpods.txt'),)
-            dawg_file = os.path.join(DAWGS_PATH, 'combined.dawg')
-    except:
-        pass
-
+    length = sys.argv[1].strip()
+    if length == 'all':
+        lengths = WORDCUBE_LENGTHS
+    else:
+        lengths = (int(length),)
+    dictionary = sys.argv[2] if len(sys.argv) > 2 else 'enable'
+    dictionary_files, dawg_file = get_dictionary(dictionary)
 
     #print(get_highest_nperms(n, dictionary_files, dawg_file))
-    print(get_hardest_wordcube(n, dictionary_files, dawg_file))
+    for n, wordcube in gen_hardest_wordcubes(lengths, dictionary_files,
+                                             dawg_file):
+        print(n, wordcube, flush=True)
 
 
 if __name__ == '__main__':
@@ -1,33 +1,160 @@
+import mmap
+import os
+import struct
+
 import dawg
 import dawg_python
-from dawg_python.compat import int_from_byte
+import numpy as np
+from dawg_python import wrapper
 
 from .board import *
 
 class ScrabbleDAWG(dawg_python.CompletionDAWG):
     """
     A CompletionDAWG with letter-restricted prefix completion options.
+
+    Traversal walks a child table exported from the DAWG (see
+    export_child_table) rather than dawg_python's double array, and indices
+    here are rows of that table. The table is cached next to the DAWG file.
+
+    Blanks only stand in for letters the rack has run out of, and are then
+    moved to the squares where they cost the fewest points, since any other
+    assignment scores no more and leaves a worse rack. Set
+    all_blank_assignments to generate every assignment instead.
+
+    Unless prune is unset, words aren't started so far left of the anchor
+    that the rack can't fill the squares up to it, and nodes before the
+    anchor aren't expanded if no word below them reaches past it, fits the
+    row or, onto an open square, takes a letter the rack has.
     """
+    all_blank_assignments = False
+    prune = True
+
     def __init__(self, *args, **kwargs):
         super(ScrabbleDAWG, self).__init__(*args, **kwargs)
+        self.dawg_file = None
+        self._buffer = None
+        self.table = None
+        self.children = None
 
-    def _get_index_from_prefix(self, prefix):
-        index = self.dct.ROOT
-        prefix, = _encode(prefix)
-        for ch in prefix:
-            index = self.dct.follow_char(int_from_byte(ch), index)
-            if index is None:
+    def __reduce__(self):
+        return _from_buffer, (type(self), self.dawg_file, bytes(self._buffer))
+
+    def load(self, path, use_mmap=True):
+        """
+        Load from path, remembering it so worker processes can reload. The
+        file is memory-mapped rather than read, so loading copies nothing and
+        processes loading the same file share its pages.
+        """
+        self.dawg_file = path
+        if not use_mmap:
+            with open(path, 'rb') as f:
+                return self._read_buffer(f.read())
+
+        with open(path, 'rb') as f:
+            return self._read_buffer(
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _read_buffer(self, buf):
+        """
+        Use the dictionary and guide units in buf, laid out as dawg_python
+        saves them, in place.
+        """
+        self._buffer = buf
+        view = memoryview(buf)
+
+        size, = struct.unpack_from('=I', view, 0)
+        self.dct = wrapper.Dictionary()
+        self.dct._units = view[4:4 + 4*size].cast('I')
+
+        offset = 4 + 4*size
+        size, = struct.unpack_from('=I', view, offset)
+        self.guide = wrapper.Guide()
+        self.guide._units = view[offset + 4:offset + 4 + 2*size]
+        return self._load_table()
+
+    def _load_table(self):
+        """
+        Load the child table cached next to the DAWG file, exporting it
+        first if it is missing, older than the file or of another layout.
+        """
+        table = None
+        table_file = self.dawg_file and self.dawg_file + TABLE_EXT
+        try:
+            if (table_file and os.path.getmtime(table_file) >=
+                    os.path.getmtime(self.dawg_file)):
+                table = np.load(table_file, mmap_mode='r')
+                if (table.dtype != np.int32 or
+                        table.shape[1:] != (TABLE_WIDTH,)):
+                    table = None
+        except (OSError, ValueError):
+            table = None
+
+        if table is None:
+            table = export_child_table(self.dct, self.guide)
+            if table_file:
+                # Per process, as several can export the same table at once
+                tmp_file = f'{table_file}.{os.getpid()}.tmp'
+                try:
+                    with open(tmp_file, 'wb') as f:
+                        np.save(f, table)
+                    os.replace(tmp_file, table_file)
+                except OSError:
+                    if os.path.exists(tmp_file):
+                        os.remove(tmp_file)
+
+        self.table = table
+        self.children = memoryview(table).cast('B').cast('i')
+        return self
+
+    def _follow(self, index, letters):
+        """Follow letters from index, returning None if they leave it."""
+        children = self.children
+        for ch in letters:
+            column = COLUMNS.get(ch)
+            if column is None:
+                return None
+            index = children[index + column]
+            if not index:
                 return None
         return index
 
+    def _get_index_from_prefix(self, prefix):
+        return self._follow(ROOT, prefix)
+
+    def valid_letters_mask(self, above, below):
+        """
+        Return the mask of letters x for which above + x + below is a word.
+        above is followed once, then each letter's edge and below from there,
+        rather than looking up all 26 candidate words from the root.
+        """
+        index = self._get_index_from_prefix(above)
+        if index is None:
+            return 0
+        return self._valid_letters_mask(index, '', below)
+
+    def _valid_letters_mask(self, index, infix, below):
+        """Mask of letters x for which x + infix + below completes index."""
+        children = self.children
+        mask = 0
+        for b in range(len(LETTERS)):
+            next_index = children[index + b]
+            if next_index:
+                next_index = self._follow(next_index, infix + below)
+                if next_index and children[next_index + FLAGS] & IS_WORD:
+                    mask |= 1 << b
+        return mask
+
     def _complete(self, index, prefix, letters):
+        children = self.children
         for ch in letters:
-            next_index = self.dct.follow_char(int_from_byte(ch), index)
+            column = COLUMNS.get(ch)
+            next_index = children[index + column] if column is not None else 0
 
             if next_index:
 
                 # Check if terminal
-                if self._has_value(next_index):
+                if children[next_index + FLAGS] & IS_WORD:
                     yield prefix + [ch]
 
                 # Recurse with remaining letters
@@ -42,233 +169,402 @@ class ScrabbleDAWG(dawg_python.CompletionDAWG):
         Returns all words that start with prefix and end in some permutation
         of one or more of letters.
         """
-        # Encode all as utf8
-
-        completions = []
-
         index = self._get_index_from_prefix(prefix)
         if index is None:
             return
 
-        prefix, letters = _encode(prefix, letters)
-
         # Attempt traversing with remaining rack letters
-        for word_bytes in self._complete(index, prefix, letters):
-            yield byte_array_to_str(word_bytes)
+        for word in self._complete(index, list(prefix), list(letters)):
+            yield ''.join(word)
 
 
-    def _gen_possible_placements(self, index, letters):
-        """Generate possible letter placements after the given index."""
-        # Check which letters are valid
-        letters = list(set(letters))        # remove duplicates
-        for letter in letters:
-            next_index = self.dct.follow_char(int_from_byte(letter), index)
-            if next_index:
-                yield next_index, chr(letter)
-
-    def gen_possible_placements(self, prefix, rack_ls, valid_letters):
+    def _gen_square(self, index, pos, counts, rack_mask, placed,
+                    row_valid_letters):
         """
-        Generate all possible letter placements with the given letters placed
-        after the given prefix.
+        Generate (next_index, letter, rack_mask) for the letters that can go on
+        square pos. The letter is taken from counts while the caller explores
+        it and returned afterwards. Letters played from a blank are uppercase.
         """
-        letters = [ch for ch in rack_ls if ch in valid_letters]
-        if WILDCARD in rack_ls:
-            letters = valid_letters
-        prefix, letters = _encode(prefix, letters)
+        all_blanks = self.all_blank_assignments
+        children = self.children
+        valid_mask = row_valid_letters[pos]
+
+        # if tile is already placed, must take this letter
+        if placed[pos]:
+            b = valid_mask.bit_length() - 1
+            next_index = children[index + b]
+            if next_index:
+                yield next_index, LETTERS[b], rack_mask
+            return
 
-        # Traverse current prefix
-        index = self._get_index_from_prefix(prefix)
-        if index is None:
-            return []
+        # find placeable letters
+        if not counts[BLANK]:
+            valid_mask &= rack_mask
+
+        while valid_mask:
+            bit = valid_mask & -valid_mask
+            valid_mask ^= bit
+            b = bit.bit_length() - 1
 
-        for _, ch in self._gen_possible_placements(index, letters):
-            yield ch
+            next_index = children[index + b]
+            if not next_index:
+                continue
 
+            # use a blank once the letter runs out (or split on using it)
+            if counts[BLANK] and (all_blanks or not counts[b]):
+                counts[BLANK] -= 1
+                yield next_index, LETTERS[b].upper(), rack_mask
+                counts[BLANK] += 1
 
-    def _gen_prefixes_with_length(self, index, rack_ls, row_valid_letters, placed):
+            if counts[b]:
+                counts[b] -= 1
+                yield (next_index, LETTERS[b],
+                       rack_mask if counts[b] else rack_mask ^ bit)
+                counts[b] += 1
+
+    def _gen_words(self, index, pos, start, anchor, counts, rack_mask,
+                   placed, row_valid_letters, row_scoring, score, word):
         """
-        Generate all prefixes with the given letters and valid placements
-        of length len(valid_letters), starting with index.
+        Grow word, which starts on square start, with a letter on square pos.
+        Words are yielded with their score once they cover the anchor and are
+        followed by an open square or the wall.
         """
-        if not row_valid_letters:
-            # Out of space
-            yield '', rack_ls
+        if pos > anchor and (pos == len(placed) or not placed[pos]):
+            if self.children[index + FLAGS] & IS_WORD:
+                yield self._emit(''.join(word), start, counts, placed,
+                                 row_scoring, score)
+        if pos == len(placed):
             return
-
-        # if tile is already placed, must take this letter, dont
-        # take one of our tiles
-        if placed[0]:
-            assert(len(row_valid_letters[0]) == 1)
-            letters, = _encode(row_valid_letters[0])
-            for next_index, ch in self._gen_possible_placements(index, letters):
-                #print('PREFIX TILE PLACED ALREADY')
-                assert(len(row_valid_letters[0]) == 1)
-                for wordpart, remaining in self._gen_prefixes_with_length(
-                        next_index,
-                        rack_ls,
-                        row_valid_letters[1:],
-                        placed[1:]):
-                    yield ch + wordpart, remaining
-                return
-
-        # find placeable letters
-        letters = [ch for ch in rack_ls if ch in row_valid_letters[0]]
-        if WILDCARD in rack_ls:
-            letters = row_valid_letters[0]
-        letters, = _encode(letters)
-
-        if not rack_ls or not letters:
-            # No valid placements
+        children = self.children
+        if pos <= anchor and self.prune and not (
+                children[index + MAX_WORD_DEPTH] > anchor - pos and
+                children[index + MIN_WORD_DEPTH] <= len(placed) - pos and
+                (placed[pos] or counts[BLANK] or
+                 children[index + SUBTREE_LETTERS] & rack_mask)):
             return
 
-        # check valid first placement, prepend to rest of word
-        for next_index, ch in self._gen_possible_placements(index, letters):
-            # if wildcard present, split on using it or not
-            if WILDCARD in rack_ls:
-                for wordpart, remaining in self._gen_prefixes_with_length(
-                        next_index,
-                        rack_ls.replace(WILDCARD, '', 1),
-                        row_valid_letters[1:],
-                        placed[1:]):
-                    yield ch.upper() + wordpart, remaining
-
-            if ch in rack_ls:       # letter could be from wildcard
-                for wordpart, remaining in self._gen_prefixes_with_length(
-                        next_index,
-                        rack_ls.replace(ch, '', 1),
-                        row_valid_letters[1:],
-                        placed[1:]):
-                    yield ch + wordpart, remaining
-
-    def gen_valid_prefixes(self, rack_ls, row, row_valid_letters):
+        for next_index, letter, next_mask in self._gen_square(
+                index, pos, counts, rack_mask, placed, row_valid_letters):
+            word.append(letter)
+            yield from self._gen_words(
+                next_index, pos + 1, start, anchor, counts, next_mask,
+                placed, row_valid_letters, row_scoring,
+                _add_square(score, row_scoring[pos], letter, placed[pos]),
+                word)
+            word.pop()
+
+    def _emit(self, word, start, counts, placed, row_scoring, score):
+        """Return (word, start, remaining, score) for a finished word."""
+        if not self.all_blank_assignments and not word.islower():
+            word, score = _place_blanks(word, start, placed, row_scoring,
+                                        score)
+        return word, start, counts_letters(counts), _final_score(score)
+
+    def _gen_anchor(self, counts, rack_mask, placed, row_valid_letters,
+                    row_scoring, anchor, left_limit):
+        """
+        Generate (word, start, remaining, score) for the words covering
+        anchor, walking each one left to right from every start square after
+        left_limit. A word can't start right after a placed tile, nor so far
+        left that the rack can't fill the open squares up to the anchor.
+        """
+        tiles = sum(counts)
+        open_squares = 0
+        for start in range(anchor, left_limit, -1):
+            open_squares += not placed[start]
+            if self.prune and open_squares > tiles:
+                break
+            if start > 0 and placed[start-1]:
+                continue
+            yield from self._gen_words(ROOT, start, start, anchor,
+                                       counts, rack_mask, placed,
+                                       row_valid_letters, row_scoring,
+                                       NO_SCORE, [])
+
+    def gen_anchor_words(self, counts, row, row_valid_letters, row_scoring,
+                         anchor, left_limit=-1):
         """
-        Generate all valid word prefixes with the given rack letters on the
-        given row (arbitrary row length, usually slice of an actual row).
+        Generate (word, start, remaining, score) for every word on the row
+        that covers the anchor square, scored with row_scoring from
+        Board.get_row_scoring. Empty squares left of the anchor are only
+        used down to (not including) left_limit, the previous anchor.
         """
         assert(len(row) == len(row_valid_letters))
-        rack_ls = ''.join(rack_ls)
+        placed = [bool(c) for c in row]
+        yield from self._gen_anchor(counts, counts_mask(counts), placed,
+                                    row_valid_letters, row_scoring, anchor,
+                                    left_limit)
 
+    def gen_row_words(self, counts, row, row_valid_letters, row_scoring,
+                      anchors):
+        """
+        Generate (anchor, word, start, remaining, score) for every word on
+        the row through the given anchors, in one pass over the row. Each
+        word is found from the first anchor it covers, with the previous
+        anchor as its left part limit (Appel and Jacobson), so none is found
+        twice. Scores are kept up as letters are placed, using row_scoring
+        from Board.get_row_scoring.
+        """
+        assert(len(row) == len(row_valid_letters))
         placed = [bool(c) for c in row]
+        rack_mask = counts_mask(counts)
 
-        for length in range(len(row) + 1):
-            # Skip when tile is placed before this one
-            if length < len(row) and placed[-1-length]:
-                #print(f'length {length} skipped')
-                continue
+        left_limit = -1
+        for anchor in anchors:
+            for word, start, remaining, score in self._gen_anchor(
+                    counts, rack_mask, placed, row_valid_letters,
+                    row_scoring, anchor, left_limit):
+                yield anchor, word, start, remaining, score
+            left_limit = anchor
 
-            # Generate possible prefixes with given length
-            #print('evaluating prefix length', length)
-            #print('PLACED:', placed)
-            letters, placed_s = row_valid_letters[-length:], placed[-length:]
-            if length == 0:
-                letters, placed_s = [], []
-            #print(letters)
-            #print(placed_s)
-            yield from self._gen_prefixes_with_length(
-                self.dct.ROOT,
-                rack_ls,
-                letters,
-                placed_s
-            )
-
-    def _gen_right_extensions(self, index, rack_ls, row_valid_letters, placed):
-        #print(f'_gen call, index={index}')
-        # If tile is placed, must use it before checking word
-        if placed and placed[0]:
-            assert(len(row_valid_letters[0]) == 1)
-            letters, = _encode(row_valid_letters[0])
-            for next_index, ch in self._gen_possible_placements(index, letters): # only placed tile
-                for suffix, remaining in self._gen_right_extensions(
-                        next_index,
-                        rack_ls,
-                        row_valid_letters[1:],
-                        placed[1:]):
-                    yield ch + suffix, remaining
-            return
 
-        # Return any possible word if the next tile is open or wall
-        #print(f'right placed: {placed[1]}')
-        if self._has_value(index) and (len(placed) < 1 or not placed[0]):
-            #print('word found')
-            yield '', rack_ls
+# Running score of a play being built: (main word letters, main word
+# multiplier, cross words, tiles placed)
+NO_SCORE = (0, 1, 0, 0)
 
-        if not row_valid_letters:
-            #print('no space')
-            # Out of space
-            return
+def _add_square(score, square, letter, placed):
+    """
+    Return the running score with letter on a square, given its row scoring
+    entry (tile_score, letter_mult, word_mult, cross_score).
+    """
+    main, mult, cross, new = score
+    tile_score, letter_mult, word_mult, cross_score = square
+    if placed:
+        return main + tile_score, mult, cross, new
 
-        # find placeable letters
-        letters = [ch for ch in rack_ls if ch in row_valid_letters[0]]
-        if WILDCARD in rack_ls:
-            letters = row_valid_letters[0]
-        #print(f'letters: {letters}')
-        letters, = _encode(letters)
-
-        if not rack_ls or not letters:
-            # No more valid placements
-            return
+    letter_score = TILE_SCORES.get(letter, 0)*letter_mult
+    if cross_score >= 0:
+        cross += (cross_score + letter_score)*word_mult
+    return main + letter_score, mult*word_mult, cross, new + 1
 
-        # Attempt to place letter
-        for next_index, ch in self._gen_possible_placements(index, letters):
-            #print(f'placing: {ch}, index={index}->{next_index}')
-            #print(f'{next_index} in?: {self._has_value(next_index)}')
-            # if wildcard present, split on using it or not
-            if WILDCARD in rack_ls:
-                for suffix, remaining in self._gen_right_extensions(
-                        next_index,
-                        rack_ls.replace(WILDCARD, '', 1),
-                        row_valid_letters[1:],
-                        placed[1:]):
-                    yield ch.upper() + suffix, remaining
-
-            if ch in rack_ls:       # letter could be from wildcard
-                for suffix, remaining in self._gen_right_extensions(
-                        next_index,
-                        rack_ls.replace(ch, '', 1),
-                        row_valid_letters[1:],
-                        placed[1:]):
-                    yield ch + suffix, remaining
-
-    def gen_right_extensions(self, prefix, rack_ls, row, row_valid_letters):
-        #print(f'gen right called with prefix {prefix}')
-        #print(f'valid letters: {row_valid_letters}')
-        #print(f'row: {row}')
-        """
-        Generate all valid words starting with the given prefix on the given
-        partial row.
-        """
-        formatted_prefix = prefix
-        prefix = prefix.lower()
 
-        #print(f'prefix: {prefix}')
+def _place_blanks(word, start, placed, row_scoring, score):
+    """
+    Move the blanks in word, which starts on square start, to the new squares
+    of the same letter where a real tile would score the least, returning the
+    word and its adjusted running score.
+    """
+    main, mult, cross, new = score
+    word = list(word)
+    for blank_letter in set(c for c in word if c.isupper()):
+        letter = blank_letter.lower()
+        squares = [k for k, c in enumerate(word)
+                   if c.lower() == letter and not placed[start + k]]
+        blanks = [k for k in squares if word[k] == blank_letter]
+        if len(blanks) == len(squares):
+            continue
+
+        # Points a real tile adds on square k, per point of tile score
+        def value(k):
+            _, letter_mult, word_mult, cross_score = row_scoring[start + k]
+            return letter_mult*(mult + (word_mult if cross_score >= 0 else 0))
+
+        squares.sort(key=value)
+        for k in squares:
+            word[k] = letter
+        for k in squares[:len(blanks)]:
+            word[k] = blank_letter
+
+        # Fold the change into the cross part, which is added unmultiplied
+        cross += TILE_SCORES[letter]*(sum(value(k) for k in blanks) -
+                                      sum(value(k) for k in
+                                          squares[:len(blanks)]))
+    return ''.join(word), (main, mult, cross, new)
+
+
+def _final_score(score):
+    main, mult, cross, new = score
+    return main*mult + cross + (BINGO_BONUS if new == RACK_TILES else 0)
+
+
+GADDAG_SEP = '>'
+
+def gen_gaddag_strings(word):
+    """
+    Yield the GADDAG paths for word: rev(word[:i]) + SEP + word[i:] for every
+    non-empty reversed part.
+    """
+    for i in range(1, len(word) + 1):
+        yield word[:i][::-1] + GADDAG_SEP + word[i:]
+
 
+class ScrabbleGADDAG(ScrabbleDAWG):
+    """
+    A GADDAG, which stores every word once per split point as the reversed
+    left part, a separator and the right part. Moves are grown leftwards from
+    the anchor square and then rightwards, so each play is found with a
+    single traversal from the anchor instead of one from every start square.
+    That leaves little for prune to cut, and checking each node costs more
+    than it saves here, so it is ignored.
+    """
+    def __contains__(self, key):
+        if isinstance(key, bytes):
+            key = key.decode('utf8')
+        return super(ScrabbleGADDAG, self).__contains__(key[::-1] + GADDAG_SEP)
 
-        assert(len(row) == len(row_valid_letters))
-        rack_ls = ''.join(rack_ls)
+    def valid_letters_mask(self, above, below):
+        """
+        Return the mask of letters x for which above + x + below is a word,
+        stored here as rev(above) + SEP + x + below, so the shared part is
+        followed once. Without above it is x + SEP + below.
+        """
+        if not above:
+            return self._valid_letters_mask(ROOT, GADDAG_SEP, below)
 
-        placed = [bool(c) for c in row]
-        index = self._get_index_from_prefix(prefix)
+        index = self._get_index_from_prefix(above[::-1] + GADDAG_SEP)
+        if index is None:
+            return 0
+        return self._valid_letters_mask(index, '', below)
 
-        # Generate right extensions from the given prefix
-        extensions = []
-        for suffix, remaining in self._gen_right_extensions(
-                index, rack_ls, row_valid_letters, placed):
-            if not suffix:          # must have letter on anchor
-                continue
-            #print(f'gen suffix: {suffix}')
-            extensions.append((formatted_prefix + suffix, remaining))
-        return extensions
+    def gen_completions(self, prefix, letters):
+        """Same as ScrabbleDAWG.gen_completions, via the reversed prefix."""
+        if not prefix:
+            # No path starts with the separator, so start from each letter
+            letters = list(letters)
+            for ch in letters:
+                remaining_letters = letters[:]
+                remaining_letters.remove(ch)
+                if ch in self:
+                    yield ch
+                yield from self.gen_completions(ch, remaining_letters)
+            return
 
+        index = self._get_index_from_prefix(prefix[::-1] + GADDAG_SEP)
+        if index is None:
+            return
 
-def byte_array_to_str(byte_array):
-    return ''.join([chr(ch) for ch in byte_array])
+        for word in self._complete(index, list(prefix), list(letters)):
+            yield ''.join(word)
 
+    def _gen_anchor(self, counts, rack_mask, placed, row_valid_letters,
+                    row_scoring, anchor, left_limit):
+        """Grow the words covering anchor leftwards from it, then right."""
+        yield from self._gen_left(ROOT, anchor, counts, rack_mask,
+                                  placed, row_valid_letters, row_scoring,
+                                  NO_SCORE, anchor, left_limit, [])
 
-def _encode(*args):
-    encoded = ()
-    for letters in args:
-        enc_letters = ''.join(letters)
-        if not isinstance(letters, bytes):
-            enc_letters = enc_letters.encode('utf8')
-        encoded += ([c for c in enc_letters],)
-    return encoded
+    def _gen_left(self, index, pos, counts, rack_mask, placed,
+                  row_valid_letters, row_scoring, score, anchor, left_limit,
+                  left):
+        """
+        Place a letter at pos, then keep growing leftwards. left holds the
+        letters placed so far, right to left.
+        """
+        for next_index, letter, next_mask in self._gen_square(
+                index, pos, counts, rack_mask, placed, row_valid_letters):
+            left.append(letter)
+            next_score = _add_square(score, row_scoring[pos], letter,
+                                     placed[pos])
+
+            # Left part is complete if the square before it is open
+            if pos == 0 or not placed[pos-1]:
+                sep_index = self.children[next_index + SEP_COLUMN]
+                if sep_index:
+                    yield from self._gen_right(sep_index, anchor + 1, pos,
+                                               counts, next_mask, placed,
+                                               row_valid_letters, row_scoring,
+                                               next_score, left, [])
+
+            # Placed tiles must be taken, empty squares only up to the limit
+            if pos > 0 and (placed[pos-1] or pos - 1 > left_limit):
+                yield from self._gen_left(next_index, pos - 1, counts,
+                                          next_mask, placed,
+                                          row_valid_letters, row_scoring,
+                                          next_score, anchor, left_limit,
+                                          left)
+            left.pop()
+
+    def _gen_right(self, index, pos, start, counts, rack_mask, placed,
+                   row_valid_letters, row_scoring, score, left, right):
+        """Extend rightwards from pos once the left part is complete."""
+        if pos == len(placed) or not placed[pos]:
+            if self.children[index + FLAGS] & IS_WORD:
+                yield self._emit(''.join(reversed(left)) + ''.join(right),
+                                 start, counts, placed, row_scoring, score)
+            if pos == len(placed):
+                return
+
+        for next_index, letter, next_mask in self._gen_square(
+                index, pos, counts, rack_mask, placed, row_valid_letters):
+            right.append(letter)
+            yield from self._gen_right(
+                next_index, pos + 1, start, counts, next_mask, placed,
+                row_valid_letters, row_scoring,
+                _add_square(score, row_scoring[pos], letter, placed[pos]),
+                left, right)
+            right.pop()
+
+def _from_buffer(lex_class, dawg_file, buf):
+    """Unpickle a lexicon from the contents of its file."""
+    lex_dawg = lex_class()
+    lex_dawg.dawg_file = dawg_file
+    return lex_dawg._read_buffer(buf)
+
+
+# Child table: a row of TABLE_WIDTH int32s per node, root first. Each letter
+# (and the GADDAG separator) has a column holding the offset of its child's
+# row, 0 for none, since no edge leads back to the root. The FLAGS column
+# holds a bitset of node flags. Offsets rather than row numbers are stored,
+# so following an edge is a single index: children[index + column]. The
+# last columns describe the words strictly below the node, for pruning: the
+# mask of letters on their paths, and the fewest and most edges to one.
+ROOT = 0
+SEP_COLUMN = len(LETTERS)
+FLAGS = SEP_COLUMN + 1
+SUBTREE_LETTERS = FLAGS + 1
+MIN_WORD_DEPTH = SUBTREE_LETTERS + 1
+MAX_WORD_DEPTH = MIN_WORD_DEPTH + 1
+TABLE_WIDTH = MAX_WORD_DEPTH + 1
+IS_WORD = 1
+HAS_WORDS = 2
+TABLE_EXT = '.table.npy'
+
+COLUMNS = dict(LETTER_INDEX)
+COLUMNS[GADDAG_SEP] = SEP_COLUMN
+
+
+def export_child_table(dct, guide):
+    """
+    Export the graph in a dawg_python Dictionary and Guide as a child
+    table, numbering nodes depth first from the root. Each node's pruning
+    columns are filled in from its children's once they are done.
+    """
+    rows = {}
+    edges = []      # (parent row, column, child row)
+    info = []       # [flags, subtree letters, min depth, max depth] per row
+
+    def visit(node):
+        row = rows[node] = len(info)
+        node_info = [IS_WORD if dct.has_value(node) else 0, 0, 0, 0]
+        info.append(node_info)
+
+        label = guide.child(node)
+        while label:
+            child = dct.follow_char(label, node)
+            column = COLUMNS.get(chr(label))
+            if column is None:
+                raise ValueError(f"Can't tabulate edge label {chr(label)!r}")
+            if child not in rows:
+                visit(child)
+            edges.append((row, column, rows[child]))
+
+            flags, letters, min_depth, max_depth = info[rows[child]]
+            if column < len(LETTERS):
+                letters |= 1 << column
+            min_depth = 1 if flags & IS_WORD else min_depth + 1
+            max_depth = max_depth + 1 if flags & HAS_WORDS else 1
+            if node_info[0] & HAS_WORDS:
+                min_depth = min(min_depth, node_info[2])
+                max_depth = max(max_depth, node_info[3])
+            node_info[:] = [node_info[0] | HAS_WORDS, node_info[1] | letters,
+                            min_depth, max_depth]
+            label = guide.sibling(child)
+
+    visit(dct.ROOT)
+
+    table = np.zeros((len(info), TABLE_WIDTH), dtype=np.int32)
+    table[:, FLAGS:] = info
+    if edges:
+        parents, columns, children = np.array(edges, dtype=np.int64).T
+        table[parents, columns] = children*TABLE_WIDTH
+    return table
@@ -0,0 +1,250 @@
+"""
+Solver server. `wwfserver [<dictionary> ...] [--gaddag] [--address
+<address>]` keeps lexicons and worker pools loaded and solves requests from
+`wwfsolve --server` (see client.py) over a Unix socket or localhost TCP.
+
+A request is a JSON line holding a "board" (board file text or rows) and a
+"rack" as in wwfbatch, optionally with a "dictionary", "gaddag" (by default
+the server's --gaddag), "k" and a "deadline" in seconds, and an "id" echoed
+back. k is a positive integer and the deadline a positive number, covering
+the whole request. Requests on a connection are answered as they finish, one
+JSON line each: {"id", "plays"} with the top k plays overall, best first, or
+{"id", "error"}.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import signal
+import sys
+import threading
+
+from .batch import load_position, play_record
+from .client import DEFAULT_ADDRESS, connect, parse_address
+from .lexicon import (
+    DICTIONARIES,
+    DEFAULT_DICTIONARY,
+    get_dictionary,
+    load_lex_dawg,
+)
+from .solver import *
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class SolveServer:
+    """
+    Answers solve requests with asyncio, solving on the shared engine for
+    each lexicon. Identical requests in flight share one solve, and
+    finished solves are kept in a SolveCache. Loading positions and
+    lexicons and submitting solves run in threads, off the event loop. A
+    request past its deadline is answered with an error, but its solve
+    still finishes and is cached.
+    """
+    def __init__(self, dictionaries=(DEFAULT_DICTIONARY,), gaddag=False,
+                 cache_size=SOLVE_CACHE_SIZE):
+        self.gaddag = gaddag
+        self.cache = SolveCache(cache_size)
+        self.solves = 0
+        self.coalesced = 0
+        self._in_flight = {}    # cache key: future of the plays
+        self._locks = {}        # dictionary name: lock for loading it
+
+        for name in dictionaries:
+            self.get_lexicon(name, gaddag)
+
+    def get_lexicon(self, name, gaddag):
+        """
+        Return the lexicon for a dictionary, loading it (building it if
+        need be) and starting its engine on first use. Safe to call from
+        several threads.
+        """
+        with self._locks.setdefault(name, threading.Lock()):
+            lex_dawg = load_lex_dawg(*get_dictionary(name), gaddag)
+            get_engine(lex_dawg)
+        return lex_dawg
+
+    async def solve(self, message):
+        """Return the top plays for a request, best last."""
+        k = message.get('k', NUM_BEST_WORDS)
+        if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+            raise ValueError(f'Invalid k {k!r}, expected a positive integer')
+        deadline = message.get('deadline')
+        if deadline is not None and (
+                isinstance(deadline, bool) or
+                not isinstance(deadline, (int, float)) or not deadline > 0):
+            raise ValueError(f'Invalid deadline {deadline!r}, expected a '
+                             f'positive number of seconds')
+
+        try:
+            # The deadline covers loading the position and lexicon too
+            return await asyncio.wait_for(self._solve(message, k), deadline)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f'Deadline of {deadline}s exceeded.')
+
+    async def _solve(self, message, k):
+        loop = asyncio.get_running_loop()
+        board, rack, lex_dawg, cache_key = await loop.run_in_executor(
+            None, self._prepare, message, k)
+
+        plays = self.cache.get(cache_key)
+        if plays is not None:
+            return plays
+
+        future = self._in_flight.get(cache_key)
+        if future is None:
+            future = self._start(board, rack, lex_dawg, k, cache_key)
+        else:
+            self.coalesced += 1
+
+        # Shielded, so a request giving up doesn't cancel the shared solve
+        return await asyncio.shield(future)
+
+    def _prepare(self, message, k):
+        """Return (board, rack, lex_dawg, cache key) for a request."""
+        board, rack = load_position(message)
+        lex_dawg = self.get_lexicon(
+            message.get('dictionary', DEFAULT_DICTIONARY),
+            bool(message.get('gaddag', self.gaddag)))
+        cache_key = self.cache.key(board, rack, lex_dawg, k, play_sorter,
+                                   'global')
+        return board, rack, lex_dawg, cache_key
+
+    def _start(self, board, rack, lex_dawg, k, cache_key):
+        """Submit a solve from a thread, returning a future of its plays."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Every request waiting on it may have given up by the time it fails
+        future.add_done_callback(_retrieve_exception)
+        self._in_flight[cache_key] = future
+        self.solves += 1
+
+        def finish(results, error):
+            del self._in_flight[cache_key]
+            if error is not None:
+                future.set_exception(error)
+                return
+            plays = [play for play in merge_plays(results, k, mode='global')
+                     if play.word]
+            self.cache.put(cache_key, plays)
+            future.set_result(plays)
+
+        def submitted(submit_future):
+            if not submit_future.cancelled() and submit_future.exception():
+                finish(None, submit_future.exception())
+
+        submit = functools.partial(
+            get_engine(lex_dawg).submit, board, rack, k, mode='global',
+            callback=lambda results: loop.call_soon_threadsafe(
+                finish, results, None),
+            error_callback=lambda error: loop.call_soon_threadsafe(
+                finish, None, error))
+        loop.run_in_executor(None, submit).add_done_callback(submitted)
+        return future
+
+    async def respond(self, line, writer, lock):
+        message_id = None
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError('expected a JSON object')
+            message_id = message.get('id')
+            plays = await self.solve(message)
+            response = {'id': message_id,
+                        'plays': [play_record(play)
+                                  for play in reversed(plays)]}
+        except Exception as e:   # answer every request, whatever went wrong
+            response = {'id': message_id, 'error': str(e)}
+
+        async with lock:
+            writer.write(json.dumps(response).encode('utf8') + b'\n')
+            await writer.drain()
+
+    async def handle(self, reader, writer):
+        """Answer each request line on a connection as it finishes."""
+        lock = asyncio.Lock()
+        tasks = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    tasks.append(asyncio.ensure_future(
+                        self.respond(line, writer, lock)))
+            await asyncio.gather(*tasks)
+        except ConnectionError:
+            for task in tasks:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def serve(self, address=DEFAULT_ADDRESS):
+        """
+        Serve on address, a Unix socket path or host:port, until interrupted
+        or terminated.
+        """
+        tcp_address = parse_address(address)
+        if tcp_address is not None:
+            server = await asyncio.start_server(self.handle, *tcp_address)
+        else:
+            if os.path.exists(address):
+                try:
+                    connect(address).close()
+                except OSError:
+                    os.remove(address)      # left by a server that died
+                else:
+                    raise OSError(f'A solver server is already listening on '
+                                  f'{address}.')
+            server = await asyncio.start_unix_server(self.handle, address)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        print(f'Solver server listening on {address}', file=sys.stderr)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if tcp_address is None and os.path.exists(address):
+                os.remove(address)
+
+
+def _retrieve_exception(future):
+    if not future.cancelled():
+        future.exception()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='wwfserver',
+        description='Serve solves from warm lexicons to wwfsolve --server.')
+    parser.add_argument('dictionaries', nargs='*', metavar='dictionary',
+                        help=f"dictionaries to load up front, of "
+                             f"{', '.join(DICTIONARIES)} (default "
+                             f"{DEFAULT_DICTIONARY}); others load on use")
+    parser.add_argument('--gaddag', action='store_true',
+                        help='generate moves with a GADDAG by default')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS,
+                        help='Unix socket path or host:port '
+                             '(default %(default)s)')
+    args = parser.parse_args()
+    for name in args.dictionaries:
+        if name not in DICTIONARIES:
+            parser.error(f"Unknown dictionary '{name}'")
+
+    server = SolveServer(args.dictionaries or (DEFAULT_DICTIONARY,),
+                         args.gaddag)
+    asyncio.run(server.serve(args.address))
+
+
+if __name__ == '__main__':
+    main()
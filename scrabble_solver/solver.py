@@ -1,180 +1,469 @@
+import atexit
+import collections
 import copy
+import heapq
 import numpy as np
 import cProfile
 import os
+import pickle
 import sys
 from pprint import pprint
 import time
 
 import itertools
-from multiprocessing import Pool
-
-from dawg import CompletionDAWG
-from .scrabble_dawg import ScrabbleDAWG
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+from .scrabble_dawg import ScrabbleDAWG, ScrabbleGADDAG
+# Lexicon helpers, also re-exported for callers importing them from here
+from .lexicon import (
+    get_dictionary,
+    get_lexicon,
+    get_words,
+    save_lex_dawg,
+    load_lex_dawg,
+    get_anagram_file,
+    load_anagram_index,
+    DICTS_PATH,
+    DAWGS_PATH,
+)
 
 from .board import *
 
 NUM_BEST_WORDS = 10
 ENDGAME_WORDS = 7
 MAX_DEPTH = 3
+ENDGAME_MAX_DEPTH = 14
 
-import os
-dirname = os.path.dirname(__file__)
-DICTS_PATH = os.path.join(dirname, 'dictionaries')
-DAWGS_PATH = os.path.join(dirname, 'dawgs')
+SOLVE_CACHE_FILE = os.path.join(DAWGS_PATH, 'solve_cache.pkl')
+SOLVE_CACHE_SIZE = 1024
 
 
 def play_sorter(play):
     """Sorts plays by score"""
     return play.score
 
-def get_words(dictionary_files):
-    words = []
-    for dictionary_file in dictionary_files:
-        with open(dictionary_file, 'r') as f:
-            for line in f.readlines():
-                word = line.strip()
-                words.append(word)
-    return list(set(words))
+def get_anchors(board):
+    """Return the board's anchor squares, row by row."""
+    return [(int(i), int(j)) for i, j in zip(*np.nonzero(board.anchors))]
+
 
+def get_row_anchors(board):
+    """Return (i, [j, ...]) for each row of the board holding anchors."""
+    return [(i, np.flatnonzero(row).tolist())
+            for i, row in enumerate(board.anchors) if row.any()]
 
 
-def save_lex_dawg(dictionary_files=('dictionaries/sowpods.txt',),
-                  outfile=DAWGS_PATH + 'sowpods.dawg'):
+def get_left_limit(board, anchor):
+    """Return the column of the previous anchor on the anchor's row, or -1."""
+    i, j = anchor
+    prev = np.flatnonzero(board.anchors[i,:j])
+    return int(prev[-1]) if len(prev) else -1
 
-    completion_dawg = CompletionDAWG(get_words(dictionary_files))
-    completion_dawg.save(outfile)
 
+class PlayCollector:
+    """
+    Collects the best plays by key in a min-heap, dropping duplicates.
+    mode is 'global' for the top k plays overall, 'anchor' for the top k
+    plays from each anchor (see end_anchor), or 'all' to keep every play.
+    """
+    MODES = ('global', 'anchor', 'all')
 
-def load_lex_dawg(dictionary_files=('dictionaries/sowpods.txt',), dawg_file=DAWGS_PATH + 'tmp.dawg'):
-    if not os.path.isfile(dawg_file):
-        # Create dawg file
-        save_lex_dawg(dictionary_files, dawg_file)
+    def __init__(self, k=NUM_BEST_WORDS, key=play_sorter, mode='global'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown collector mode '{mode}'.")
+        self.k = None if mode == 'all' else k
+        self.key = key
+        self.mode = mode
 
-    return ScrabbleDAWG().load(dawg_file)
+        self._heap = []         # (key, seq, play), worst play first
+        self._done = []         # finished anchors' plays in 'anchor' mode
+        self._seen = set()
+        self._seq = itertools.count()
 
+    def __len__(self):
+        return len(self._heap) + len(self._done)
 
-def gen_adjacent_spots(i, j):
-    dirs = [-1, 1]
-    for d in dirs:
-        if i+d >= 0 and i+d < BOARD_LEN:
-            yield i+d, j
-        if j+d >= 0 and j+d < BOARD_LEN:
-            yield i, j+d
+    def add(self, play):
+        """Add play, returning whether it was kept."""
+        play_key = _play_key(play)
+        if play_key in self._seen:
+            return False
 
+        entry = (self.key(play), next(self._seq), play)
+        if self.k is None or len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[0] > self._heap[0][0]:
+            worst = heapq.heapreplace(self._heap, entry)
+            self._seen.discard(_play_key(worst[-1]))
+        else:
+            return False
 
-def get_anchors(board):
-    anchors = []
-    for i, row in enumerate(board.board):
-        for j, letter in enumerate(row):
-            if not board.board[i,j]:
-                for adj_i, adj_j in gen_adjacent_spots(i, j):
-                    if board.board[adj_i, adj_j]:
-                        anchors.append((i,j))
-                        break
-
-    # Add center tile as anchor if board empty
-    if not anchors:
-        anchors.append((BOARD_LEN//2, BOARD_LEN//2))
-    return anchors
-
-
-def generate_moves(board, rack, lex_dawg, anchor, best_words):
-    """Generate all possible moves from a given anchor point"""
+        self._seen.add(play_key)
+        return True
+
+    def extend(self, plays):
+        for play in plays:
+            self.add(play)
+
+    def end_anchor(self):
+        """In 'anchor' mode, start a new top k for the next anchor."""
+        if self.mode == 'anchor':
+            self._done.extend(self._heap)
+            self._heap = []
+
+    def plays(self):
+        """Return the collected plays, sorted by key, best last."""
+        return [entry[-1] for entry in sorted(self._done + self._heap)]
+
+
+def _play_key(play):
+    return (play.word, play.i, play.j, play.score, play.vertical)
+
+
+def generate_moves(board, rack, lex_dawg, anchor, collector, left_limit=None):
+    """
+    Generate all possible moves from a given anchor point, adding them to
+    the PlayCollector collector. left_limit is the previous anchor on the
+    row, found from the board if not given.
+    """
     # Calculate valid placements for row
     i, j = anchor
     row_valid_letters = board.row_valid_letters[i]
+    if left_limit is None:
+        left_limit = get_left_limit(board, anchor)
+
+    for word, start, remaining, score in lex_dawg.gen_anchor_words(
+            rack_counts(rack.letters),
+            board.board[i],
+            row_valid_letters,
+            board.get_row_scoring(i),
+            j,
+            left_limit):
+
+        collector.add(
+            Play(word=word, i=i, j=start, score=score, remaining=remaining)
+        )
 
-    # Calculate all valid left prefixes
-    for prefix, remaining_left in lex_dawg.gen_valid_prefixes(
-            rack.letters,
-            board.board[i,:j],
-            row_valid_letters[:j]):
+    collector.end_anchor()
+    return collector
 
-        # Calculate right extensions for all left prefixes
-        #print(f'\nextending {prefix} with letters: {remaining_left}')
-        for word, remaining in lex_dawg.gen_right_extensions(
-                prefix,
-                remaining_left,
-                board.board[i,j:],
-                row_valid_letters[j:]):
 
-            score = board.score_word(word, (i, j-len(prefix)))
-            play = Play(word=word, i=i, j=j-len(prefix), score=score, remaining=remaining)
+def generate_row_moves(board, rack, lex_dawg, i, anchors, collector):
+    """
+    Generate the moves through the anchors (columns) on row i in one pass
+    over the row, scored as they are built, adding them to the PlayCollector
+    collector.
+    """
+    last_anchor = None
+    for anchor, word, start, remaining, score in lex_dawg.gen_row_words(
+            rack_counts(rack.letters),
+            board.board[i],
+            board.row_valid_letters[i],
+            board.get_row_scoring(i),
+            anchors):
+
+        if anchor != last_anchor:
+            collector.end_anchor()
+            last_anchor = anchor
+        collector.add(
+            Play(word=word, i=i, j=start, score=score, remaining=remaining)
+        )
 
-            if len(best_words) == NUM_BEST_WORDS:
-                best_words.sort(key=play_sorter)
-                if score > best_words[0].score:
-                    best_words.pop(0)
-                    best_words.append(play)
-            else:
-                best_words.append(play)
+    collector.end_anchor()
+    return collector
 
 
-    return best_words
+_worker_lex_dawg = None
 
+def _init_worker(dawg_file, lex_class):
+    """Pool initializer, loads the lexicon once per worker process."""
+    global _worker_lex_dawg
+    _worker_lex_dawg = lex_class().load(dawg_file)
 
-def remove_duplicates(ls):
-    out = []
-    for l in ls:
-        if l not in out:
-            out.append(l)
-    return out
 
+_worker_solve = (None, None)     # solve id, (board, tboard, rack, k, key, mode)
 
+def _unpack_solve(solve_id):
+    """
+    Read a solve's payload from the shared memory block named solve_id,
+    once per solve in each worker.
+    """
+    global _worker_solve
+    if _worker_solve[0] != solve_id:
+        block = shared_memory.SharedMemory(solve_id)
+        try:
+            payload = bytes(block.buf)
+        finally:
+            block.close()
+        tiles, valid_letters, cross_scores, letters, k, key, mode = \
+            pickle.loads(payload)
+        board = Board(board=tiles)
+        board.row_valid_letters, board.col_valid_letters = valid_letters
+        board.row_cross_scores, board.col_cross_scores = cross_scores
+        _worker_solve = (solve_id, (board, board.transpose(), Rack(letters),
+                                    k, key, mode))
+    return _worker_solve[1]
+
+
+def _generate_moves_worker(solve_id, i, vertical):
+    board, tboard, rack, k, key, mode = _unpack_solve(solve_id)
+    oboard = tboard if vertical else board
+    collector = PlayCollector(k, key, mode)
+    generate_row_moves(oboard, rack, _worker_lex_dawg, i,
+                       np.flatnonzero(oboard.anchors[i]).tolist(), collector)
+
+    best_words = collector.plays()
+    for play in best_words:
+        play.vertical = vertical
+    return best_words
 
-def solve_board(board, rack, lex_dawg, print_words=False):
-    pool = Pool()
 
-    board.calc_row_valid_letters(lex_dawg)
+def pack_solve(board, rack, k=NUM_BEST_WORDS, key=play_sorter,
+               mode='anchor'):
+    """
+    Pack the part of a board and rack the move generator reads, in both
+    orientations, and the collector settings into a compact payload. The
+    board must have its valid letters calculated.
+    """
+    return pickle.dumps(
+        (board.board,
+         (board.row_valid_letters, board.col_valid_letters),
+         (board.row_cross_scores, board.col_cross_scores),
+         rack.letters, k, key, mode),
+        pickle.HIGHEST_PROTOCOL
+    )
 
-    # Horizontal plays
-    hargs = []
-    for anchor in get_anchors(board):
-        hargs.append(
-            (board, rack, lex_dawg, anchor, [])
-        )
 
-    best_hwords = [Play()]
-    best_hanchor_plays = pool.starmap(generate_moves, hargs, chunksize=1)
+class SolverEngine:
+    """
+    Long-lived solver owning a worker pool. Workers load the lexicon once at
+    startup, so each solve only ships (board, rack) jobs.
+    """
+    def __init__(self, lex_dawg, processes=None):
+        if lex_dawg.dawg_file is None:
+            raise ValueError('SolverEngine needs a lexicon loaded from a file.')
+        self.lex_dawg = lex_dawg
+        self._blocks = {}       # solve id: shared memory block of its payload
+
+        # Workers share this process's tracker of shared memory blocks, so
+        # their attaching to a block doesn't leave it to be unlinked twice
+        resource_tracker.ensure_running()
+        self.pool = Pool(processes,
+                         initializer=_init_worker,
+                         initargs=(lex_dawg.dawg_file, type(lex_dawg)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        for solve_id in list(self._blocks):
+            self.release_solve(solve_id)
+
+    def get_tasks(self, board, rack, k=NUM_BEST_WORDS, key=play_sorter,
+                  mode='anchor'):
+        """
+        Return (solve_id, tasks) for a solve. The board, rack and collector
+        settings are packed once into a shared memory block named solve_id,
+        which each worker reads once per solve, so a task is only
+        (solve_id, row, vertical) and the lexicon is never sent. Workers
+        collect plays with PlayCollector(k, key, mode). Free the block with
+        release_solve once the tasks are done.
+        """
+        board.ensure_valid_letters(self.lex_dawg)
+        payload = pack_solve(board, rack, k, key, mode)
+        block = shared_memory.SharedMemory(create=True, size=len(payload))
+        block.buf[:len(payload)] = payload
+        solve_id = block.name
+        self._blocks[solve_id] = block
+
+        tasks = []
+        for vertical, oboard in ((False, board), (True, board.transpose())):
+            for i, _ in get_row_anchors(oboard):
+                tasks.append((solve_id, i, vertical))
+        return solve_id, tasks
+
+    def release_solve(self, solve_id):
+        """Free the shared memory block of a solve's payload."""
+        block = self._blocks.pop(solve_id, None)
+        if block is not None:
+            block.close()
+            block.unlink()
+
+    def submit(self, board, rack, k=NUM_BEST_WORDS, key=play_sorter,
+               mode='anchor', callback=None, error_callback=None):
+        """
+        Start a solve without waiting for it, returning the AsyncResult of
+        its tasks, which merge_plays turns into the best plays. callback
+        and error_callback are passed on to the pool, and are called after
+        the solve's payload is released.
+        """
+        solve_id, tasks = self.get_tasks(board, rack, k, key, mode)
+
+        def done(results):
+            self.release_solve(solve_id)
+            if callback is not None:
+                callback(results)
+
+        def failed(error):
+            self.release_solve(solve_id)
+            if error_callback is not None:
+                error_callback(error)
+
+        try:
+            return self.pool.starmap_async(_generate_moves_worker, tasks,
+                                           chunksize=1, callback=done,
+                                           error_callback=failed)
+        except Exception:
+            self.release_solve(solve_id)
+            raise
+
+    def solve(self, board, rack, print_words=False, k=NUM_BEST_WORDS,
+              key=play_sorter, mode='anchor'):
+        """
+        Return the best plays sorted by key, best last. mode is a
+        PlayCollector mode: the top k plays from each anchor (default), the
+        top k overall ('global'), or every play ('all').
+        """
+        best_words = merge_plays(self.submit(board, rack, k, key, mode).get(),
+                                 k, key, mode)
+
+        if print_words:
+            print_plays(board, best_words)
+
+        return best_words
+
+
+def merge_plays(results, k=NUM_BEST_WORDS, key=play_sorter, mode='anchor'):
+    """
+    Merge the plays from the tasks of a solve, as SolverEngine.solve
+    returns them, best last.
+    """
+    # Workers already kept the top k for each anchor
+    best_words = PlayCollector(k, key, 'all' if mode == 'anchor' else mode)
+    best_words.extend([Play(vertical=False), Play(vertical=True)])
+    for best_plays in results:
+        best_words.extend(best_plays)
+    return best_words.plays()
+
 
-    # Vertical plays
-    tboard = board.transpose(recalc=True, dawg=lex_dawg)
-    vargs = []
-    for anchor in get_anchors(tboard):
-        vargs.append(
-            (tboard, rack, lex_dawg, anchor, [])
-        )
-    best_vwords = [Play()]
-    best_vanchor_plays = pool.starmap(generate_moves, vargs, chunksize=1)
+_engines = {}
+
+def get_engine(lex_dawg):
+    """Return the shared engine for lex_dawg's file, starting it if needed."""
+    engine = _engines.get(lex_dawg.dawg_file)
+    if engine is None:
+        engine = SolverEngine(lex_dawg)
+        _engines[lex_dawg.dawg_file] = engine
+    return engine
 
 
-    # Flatten plays
-    for best_plays in best_hanchor_plays:
-        best_hwords.extend(best_plays)
-    for best_plays in best_vanchor_plays:
-        best_vwords.extend(best_plays)
+def close_engine(lex_dawg):
+    """Close the shared engine for lex_dawg's file, if it was started."""
+    engine = _engines.pop(lex_dawg.dawg_file, None)
+    if engine is not None:
+        engine.close()
 
 
-    # Concat plays
-    for play in best_hwords:
-        play.vertical = False
-    for play in best_vwords:
-        play.vertical = True
+@atexit.register
+def close_engines():
+    for engine in _engines.values():
+        engine.close()
+    _engines.clear()
 
-    best_words = best_hwords + best_vwords
-    best_words.sort(key=play_sorter)
 
-    #best_words = best_words[-NUM_BEST_WORDS:]
+def print_plays(board, plays):
+    for play in plays:
+        new_board = board.add_word(play)
 
-    if print_words:
-        for play in best_words:
-            new_board = board.add_word(play)
+        print(f'\n-----{play.word}: {play.score}-----')
+        print(new_board)
 
-            print(f'\n-----{play.word}: {play.score}-----')
-            print(new_board)
 
-    best_words = remove_duplicates(best_words)
+class SolveCache:
+    """
+    LRU cache of solve results, keyed by the board's tiles, the rack's
+    letters, the lexicon file and the collector settings. Keeps up to
+    maxsize results and counts hits and misses. If path is given, results
+    are loaded from it and save() writes them back.
+    """
+    def __init__(self, maxsize=SOLVE_CACHE_SIZE, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._plays = collections.OrderedDict()
+
+        if path is not None and os.path.isfile(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._plays)
+
+    def key(self, board, rack, lex_dawg, k, key, mode):
+        return (lex_dawg.dawg_file, os.path.getmtime(lex_dawg.dawg_file),
+                board.board.tobytes(), ''.join(sorted(rack.letters)), k,
+                f'{key.__module__}.{key.__qualname__}', mode)
+
+    def get(self, cache_key):
+        """Return a copy of the cached plays for cache_key, or None."""
+        plays = self._plays.get(cache_key)
+        if plays is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._plays.move_to_end(cache_key)
+        return plays[:]
+
+    def put(self, cache_key, plays):
+        self._plays[cache_key] = plays[:]
+        self._plays.move_to_end(cache_key)
+        while len(self._plays) > self.maxsize:
+            self._plays.popitem(last=False)
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                items = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+                TypeError, ValueError):
+            print(f'Could not read solve cache {path}, starting empty.')
+            return
+        for cache_key, plays in items:
+            self.put(cache_key, plays)
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump(list(self._plays.items()), f,
+                        pickle.HIGHEST_PROTOCOL)
+
+
+def solve_board(board, rack, lex_dawg, print_words=False, k=NUM_BEST_WORDS,
+                key=play_sorter, mode='anchor', cache=None):
+    """
+    Return the best plays for rack on board, best last (see
+    SolverEngine.solve). Results are memoized in cache, a SolveCache, if
+    given.
+    """
+    if cache is not None:
+        cache_key = cache.key(board, rack, lex_dawg, k, key, mode)
+        best_words = cache.get(cache_key)
+        if best_words is not None:
+            if print_words:
+                print_plays(board, best_words)
+            return best_words
+
+    best_words = get_engine(lex_dawg).solve(board, rack, print_words, k, key,
+                                            mode)
+    if cache is not None:
+        cache.put(cache_key, best_words)
     return best_words
 
 def _get_ending_plays(plays):
@@ -190,65 +479,181 @@ def _end_sorter(seq):
     return seq[0][-1]
 
 
-def _eval_endgame(lex_dawg, board, rack, opp_rack, depth):
-    #print(f'***evaluating endgame depth {depth}')
-    # No letters, no score possible
-    if not opp_rack.letters:
-        assert False, 'opp rack should return if empty, not get here'
-        #return [(Play(), -1*board._score_existing_word(rack.letters))]
-    if depth == MAX_DEPTH:
-        return [(Play(), 0)]
-
-    # Return the score differential of best play - their best play diff
-    board = copy.copy(board)
-    rack = copy.copy(rack)
-
-    plays = solve_board(board, rack, lex_dawg, print_words=False)
-
-    best_seqs = []
-
-    # Consider highest scoring ending play
-    ending_plays = _get_ending_plays(plays)
-    if ending_plays:
-        ending_plays.sort(key=play_sorter, reverse=True)
-        ending = ending_plays[0]
-        end_bonus = 2*board._score_existing_word(opp_rack.letters)
-        ending_seq = [
-            (ending, ending.score + end_bonus),
-            (Play(), -end_bonus)
-        ]
-        best_seqs.append(ending_seq)
-
-    plays.sort(key=play_sorter, reverse=True)
-    plays = plays[:ENDGAME_WORDS]
-
-    for i, play in enumerate(plays):
-        if depth < 1:
-            print(f'Evaluating depth {depth}: play {i+1} of {len(plays)}')
-        # Subtract differential of opponents best play
-        scorediff = play.score
+class EndgameTimeout(Exception):
+    pass
 
-        next_rack = Rack(rack.letters)
-        next_board = board.add_word(play, next_rack)
 
-        opp_best_seq = _eval_endgame(lex_dawg, next_board,
-                                      opp_rack, next_rack, depth+1)
+# Transposition table bound flags
+EXACT, LOWER, UPPER = range(3)
 
-        scorediff -= opp_best_seq[0][-1]
-        best_seqs.append([(play, scorediff)] + opp_best_seq)
+class _EndgameSearch:
+    """
+    State shared across an endgame search: the transposition table of
+    searched positions, the plays solved for each position and the deadline.
+    """
+    def __init__(self, lex_dawg, deadline=None, cache=None):
+        self.lex_dawg = lex_dawg
+        self.deadline = deadline
+        self.table = {}
+        self.cache = SolveCache() if cache is None else cache
+        self.nodes = 0
+        self.depth_limited = False
+
+    def check_time(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise EndgameTimeout()
+
+    def position_key(self, board, rack, opp_rack):
+        return (board.zobrist, rack.zobrist, opp_rack.zobrist)
+
+    def get_moves(self, board, rack, opp_rack, best_first=None):
+        """
+        Return the moves to search from a position, best first: the highest
+        scoring ending play, then the ENDGAME_WORDS highest scoring other
+        plays. best_first, the best move found by a shallower search, is
+        moved to the front.
+        """
+        plays = solve_board(board, rack, self.lex_dawg, cache=self.cache)
+
+        moves = []
+        ending_plays = _get_ending_plays(plays)
+        if ending_plays:
+            moves.append(max(ending_plays, key=play_sorter))
+
+        # Both orientations' passes are the same move
+        plays = [play for play in plays if play.word] + [Play()]
+        plays.sort(key=play_sorter, reverse=True)
+        moves.extend(plays[:ENDGAME_WORDS])
+
+        if best_first is not None:
+            for i, move in enumerate(moves):
+                if _play_key(move) == _play_key(best_first):
+                    moves.insert(0, moves.pop(i))
+                    break
+        return moves
+
+    def search_move(self, board, rack, opp_rack, play, depth, alpha, beta):
+        """Return (scorediff, seq) for making play, then searching on."""
+        if play.remaining == '':
+            end_bonus = 2*board._score_existing_word(opp_rack.letters)
+            scorediff = play.score + end_bonus
+            return scorediff, [(play, scorediff), (Play(), -end_bonus)]
 
-    # TODO make this shit not hideous
-    best_seqs.sort(key=_end_sorter, reverse=True)
-    if depth == 0:
-        return best_seqs
-    return best_seqs[0]
+        next_rack = Rack(rack.letters)
+        next_board = board.add_word(play, next_rack, self.lex_dawg)
 
+        # Subtract differential of opponents best play
+        opp_diff, opp_seq = self.search(next_board, opp_rack, next_rack,
+                                        depth - 1, -beta, -alpha)
+        scorediff = play.score - opp_diff
+        return scorediff, [(play, scorediff)] + opp_seq
+
+    def search(self, board, rack, opp_rack, depth, alpha, beta):
+        """
+        Negamax search with alpha-beta pruning. Returns the best score
+        differential for the player with rack to move, searching depth
+        plies, and the sequence of (play, scorediff) that reaches it.
+        """
+        if depth == 0:
+            self.depth_limited = True
+            return 0, [(Play(), 0)]
+        self.check_time()
+        self.nodes += 1
+
+        key = self.position_key(board, rack, opp_rack)
+        best_first = None
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, value, flag, seq = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value, seq
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, seq
+            best_first = seq[0][0]
+
+        orig_alpha = alpha
+        best = (float('-inf'), None)
+        for play in self.get_moves(board, rack, opp_rack, best_first):
+            value, seq = self.search_move(board, rack, opp_rack, play, depth,
+                                          alpha, beta)
+            if value > best[0]:
+                best = (value, seq)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
 
+        flag = EXACT
+        if best[0] <= orig_alpha:
+            flag = UPPER
+        elif best[0] >= beta:
+            flag = LOWER
+        self.table[key] = (depth, best[0], flag, best[1])
+        return best
+
+    def search_root(self, board, rack, opp_rack, depth, order=None):
+        """
+        Search every move from the root, returning their sequences sorted
+        best first. Moves searched after the best one are pruned, so their
+        score differentials are upper bounds.
+        """
+        moves = order or self.get_moves(board, rack, opp_rack)
+        alpha = float('-inf')
+        best_seqs = []
+        for play in moves:
+            value, seq = self.search_move(board, rack, opp_rack, play, depth,
+                                          alpha, float('inf'))
+            alpha = max(alpha, value)
+            best_seqs.append(seq)
+
+        best_seqs.sort(key=_end_sorter, reverse=True)
+        return best_seqs
 
-def eval_endgame(board, rack, lex_dawg, print_words=False):
+
+def _eval_endgame(lex_dawg, board, rack, opp_rack, max_depth=MAX_DEPTH,
+                  time_budget=None, cache=None):
+    """
+    Search the endgame by iterative deepening up to max_depth plies, within
+    time_budget seconds if given. Returns the root sequences from the
+    deepest completed search, best first.
+    """
+    deadline = None
+    if time_budget is not None:
+        deadline = time.perf_counter() + time_budget
+    search = _EndgameSearch(lex_dawg, deadline, cache)
+
+    best_seqs = None
+    for depth in range(1, max_depth + 1):
+        order = None
+        if best_seqs:
+            order = [seq[0][0] for seq in best_seqs]
+
+        search.depth_limited = False
+        try:
+            best_seqs = search.search_root(board, rack, opp_rack, depth, order)
+        except EndgameTimeout:
+            print(f'Out of time, using depth {depth-1} search.')
+            break
+        print(f'Searched depth {depth}: {search.nodes} nodes, '
+              f'best {best_seqs[0][0]}')
+
+        # Every line ended before the depth limit, deeper search is the same
+        if not search.depth_limited:
+            break
+
+    return best_seqs
+
+
+def eval_endgame(board, rack, lex_dawg, print_words=False, time_budget=None,
+                 max_depth=None, cache=None):
     """
-    Perform a 2-ply adversarial search for the highest score
-    score differential over the X highest scoring words.
+    Perform an adversarial alpha-beta search for the highest score
+    differential over the X highest scoring words. Searches MAX_DEPTH plies,
+    or as deep as possible within time_budget seconds if given.
     """
     print('All tiles known, evaluating endgame...')
 
@@ -257,10 +662,15 @@ def eval_endgame(board, rack, lex_dawg, print_words=False):
     print(f'Oppenent rack: {opp_rack}')
     assert(not board.get_remaining_tiles())
 
-    best_plays = _eval_endgame(lex_dawg, board, rack, opp_rack, 0)
+    if max_depth is None:
+        max_depth = MAX_DEPTH if time_budget is None else ENDGAME_MAX_DEPTH
+
+    best_plays = _eval_endgame(lex_dawg, board, rack, opp_rack, max_depth,
+                               time_budget, cache)
     for plays in best_plays:
         print()
         print(plays)
+    return best_plays
 
 
 
@@ -294,8 +704,7 @@ def play_urself(lex_dawg):
                 highest_word = play
 
             # place and print word
-            board = board.add_word(play, rack=rack)
-            board.calc_row_valid_letters(lex_dawg)  # recalculate checksums
+            board = board.add_word(play, rack=rack, lex_dawg=lex_dawg)
 
             print(f'-----{play.word}: {play.score}-----')
             print(board)
@@ -316,28 +725,22 @@ def play_urself(lex_dawg):
 
 
 def solve_board_cli():
-    if len(sys.argv) < 3:
-        print('USAGE: wwfsolve <board_file> <letters> [<dictionary>]')
-        print(' - Available dictionaries: enable (default), sowpods, comb')
+    gaddag = '--gaddag' in sys.argv
+    argv = [arg for arg in sys.argv if arg != '--gaddag']
+
+    if len(argv) < 3:
+        print('USAGE: wwfsolve <board_file> <letters> [<dictionary>] [--gaddag]')
+        print(' - Available dictionaries: enable (default), sowpods, '
+              'sowpods_gz, comb')
+        print(' - --gaddag generates moves with a GADDAG instead of a DAWG')
         exit(0)
 
-    board_file = sys.argv[1].strip()
-    rack_ls = sys.argv[2].strip()
-    dictionary_files = (os.path.join(DICTS_PATH, 'enable2k.txt'),
-                        os.path.join(DICTS_PATH, 'wwf_additions.txt'))
-    dawg_file = os.path.join(DAWGS_PATH, 'wwf.dawg')
-    try:
-        dictionary = sys.argv[3]
-        if dictionary == 'sowpods':
-            dictionary_files = (os.path.join(DICTS_PATH, 'sowpods.txt'),)
-            dawg_file = os.path.join(DAWGS_PATH, 'sowpods.dawg')
-        if dictionary == 'comb':
-            dictionary_files += (os.path.join(DICTS_PATH, 'sowpods.txt'),)
-            dawg_file = os.path.join(DAWGS_PATH, 'combined.dawg')
-    except:
-        pass
-
-    lex_dawg = load_lex_dawg(dictionary_files, dawg_file)
+    board_file = argv[1].strip()
+    rack_ls = argv[2].strip()
+    dictionary = argv[3] if len(argv) > 3 else 'enable'
+    dictionary_files, dawg_file = get_dictionary(dictionary)
+
+    lex_dawg = load_lex_dawg(dictionary_files, dawg_file, gaddag)
 
     board = Board()
     board.load(board_file)
@@ -349,28 +752,22 @@ def solve_board_cli():
     print(f'Solving board with letters: {rack}...')
 
 
+    cache = SolveCache(path=SOLVE_CACHE_FILE)
+
     # TODO XXX fix/redo this
     if len(board.get_remaining_tiles()) <= RACK_TILES:
-        eval_endgame(board, rack, lex_dawg, print_words=False)
-        return
+        eval_endgame(board, rack, lex_dawg, print_words=False, cache=cache)
+    else:
+        best_words = solve_board(board, rack, lex_dawg, print_words=True,
+                                 cache=cache)
 
-    best_words = solve_board(board, rack, lex_dawg, print_words=True)
+    cache.save()
+    print(f'Solve cache: {cache.hits} hits, {cache.misses} misses')
 
 
 def main():
-    dictionary_files = (os.path.join(DICTS_PATH, 'enable2k.txt'),
-                        os.path.join(DICTS_PATH, 'wwf_additions.txt'))
-    dawg_file = os.path.join(DAWGS_PATH + 'wwf.dawg')
-
-    # sowpods
-    #dictionary_files = (os.path.join(DICTS_PATH, 'sowpods.txt'),)
-    #dawg_file = os.path.join(DAWGS_PATH, 'sowpods.dawg')
-
-    # combined
-    #dictionary_files += (os.path.join(DICTS_PATH, 'sowpods.txt'),)
-    #dawg_file = os.path.join(DAWGS_PATH, 'combined.dawg')
-
-    lex_dawg = load_lex_dawg(dictionary_files, dawg_file)
+    # or 'sowpods', 'comb'
+    lex_dawg = load_lex_dawg(*get_dictionary('enable'))
 
     play_urself(lex_dawg)
 
@@ -1,24 +1,21 @@
 import sys
 from pprint import pprint
 
-from solver import load_lex_dawg
+from .lexicon import get_dictionary, load_anagram_index
 
 if __name__ == '__main__':
     if len(sys.argv) != 2:
-        print('USAGE: python3 wordcube.py <letters>')
+        print('USAGE: python3 -m scrabble_solver.wordcube <letters>')
         print('first letter is required letter')
+        exit()
 
     letters = sys.argv[1].strip().lower()
     req = letters[0]
 
-    dawg = load_lex_dawg(('dictionaries/enable2k.txt',),
-                         'dawgs/enable1.dawg')
+    index = load_anagram_index(*get_dictionary('enable'))
 
     print(f'letters: {letters}, required={req}')
 
-    words = []
-    for word in dawg.gen_completions('', letters):
-        if len(word) > 3 and req in word:
-            words.append(word)
+    words = list(index.gen_subanagrams(letters, required=req, min_len=4))
     words.sort(key=len)
     pprint(words)
@@ -23,9 +23,13 @@ setuptools.setup(
     ],
     entry_points={
         'console_scripts': [
-            'wwfsolve = scrabble_solver.solver:solve_board_cli',
+            'wwfsolve = scrabble_solver.client:main',
 			'wwftest = scrabble_solver.solver:main',
-            'perm_count = scrabble_solver.perm_count:main'
+            'perm_count = scrabble_solver.perm_count:main',
+            'wwfbench = scrabble_solver.bench:main',
+            'wwflex = scrabble_solver.lexicon:main',
+            'wwfbatch = scrabble_solver.batch:main',
+            'wwfserver = scrabble_solver.server:main',
         ]
     }
 )
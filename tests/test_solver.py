@@ -0,0 +1,202 @@
+import os
+import types
+
+import pytest
+
+from scrabble_solver.batch import play_record, solve_batch
+from scrabble_solver.lexicon import Lexicon, get_dictionary, load_lex_dawg
+from scrabble_solver.solver import *
+
+PACKAGE_DIR = os.path.join(os.path.dirname(__file__), os.pardir,
+                           'scrabble_solver')
+BOARD_FILE = os.path.join(PACKAGE_DIR, 'test_board.txt')
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['dawg', 'gaddag'])
+def lex_dawg(request):
+    return load_lex_dawg(*get_dictionary('enable'), request.param)
+
+
+@pytest.fixture
+def board(lex_dawg):
+    board = Board()
+    board.load(BOARD_FILE)
+    board.ensure_valid_letters(lex_dawg)
+    return board
+
+
+def _gen_plays(board, rack, lex_dawg, by_anchor):
+    plays = set()
+    for oboard in (board, board.transpose()):
+        collector = PlayCollector(mode='all')
+        for i, anchors in get_row_anchors(oboard):
+            if by_anchor:
+                for j in anchors:
+                    generate_moves(oboard, rack, lex_dawg, (i, j), collector)
+            else:
+                generate_row_moves(oboard, rack, lex_dawg, i, anchors,
+                                   collector)
+        plays.update((oboard is not board, play.word, play.i, play.j,
+                      play.score) for play in collector.plays())
+    return plays
+
+
+@pytest.mark.parametrize('letters', ['pesob?e', 'ta?se', 'r??e'])
+def test_anchor_scores_match_row_scores(board, lex_dawg, letters):
+    rack = Rack(letters)
+    anchor_plays = _gen_plays(board, rack, lex_dawg, by_anchor=True)
+    assert anchor_plays == _gen_plays(board, rack, lex_dawg, by_anchor=False)
+
+    for vertical, word, i, j, score in anchor_plays:
+        oboard = board.transpose() if vertical else board
+        assert oboard.score_word(word, (i, j)) == score
+
+
+@pytest.mark.parametrize('prefix', ['', 'ca', 're', 'zzz'])
+def test_gaddag_completions_match_dawg(prefix):
+    dawg = load_lex_dawg(*get_dictionary('enable'))
+    gaddag = load_lex_dawg(*get_dictionary('enable'), True)
+    for letters in ('tac', 'staple', 'ee'):
+        assert list(gaddag.gen_completions(prefix, letters)) == \
+            list(dawg.gen_completions(prefix, letters))
+
+
+
+@pytest.mark.parametrize('letters', ['a'*16, 'a'*17 + '?'*20, 'aeinrst'])
+def test_rack_zobrist_any_count(letters):
+    rack = Rack(letters)
+    assert rack.zobrist == Rack(letters[::-1]).zobrist
+    rack.remove_letters(letters[:3])
+    assert rack.zobrist == Rack(letters[3:]).zobrist
+    rack.remove_letters(letters[3:])
+    assert rack.zobrist == 0
+
+
+def test_rack_zobrist_other_characters():
+    assert Rack('ABC').zobrist == Rack('CBA').zobrist != Rack('abc').zobrist
+
+
+def test_collector_modes():
+    plays = [Play(word=word, score=score)
+             for word, score in (('ab', 3), ('cd', 5), ('ef', 1))]
+
+    collector = PlayCollector(2, mode='global')
+    collector.extend(plays + [Play(word='cd', score=5)])
+    assert [play.word for play in collector.plays()] == ['ab', 'cd']
+
+    collector = PlayCollector(1, mode='anchor')
+    collector.extend(plays[:2])
+    collector.end_anchor()
+    collector.add(plays[2])
+    assert [play.word for play in collector.plays()] == ['ef', 'cd']
+
+    collector = PlayCollector(1, mode='all')
+    collector.extend(plays)
+    assert len(collector) == 3
+
+    with pytest.raises(ValueError):
+        PlayCollector(mode='best')
+
+
+@pytest.fixture
+def fake_lex(tmp_path):
+    dawg_file = tmp_path / 'fake.dawg'
+    dawg_file.write_bytes(b'')
+    return types.SimpleNamespace(dawg_file=str(dawg_file))
+
+
+def test_solve_cache_eviction(fake_lex):
+    cache = SolveCache(maxsize=2)
+    keys = [cache.key(Board(), Rack(letters), fake_lex, 10, play_sorter,
+                      'global') for letters in ('ab', 'cd', 'ef')]
+    cache.put(keys[0], [Play(word='ab')])
+    cache.put(keys[1], [Play(word='cd')])
+    assert cache.get(keys[0])[0].word == 'ab'     # now most recently used
+    cache.put(keys[2], [Play(word='ef')])
+
+    assert len(cache) == 2
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_solve_cache_key(fake_lex):
+    cache = SolveCache()
+    key = cache.key(Board(), Rack('ab'), fake_lex, 10, play_sorter, 'global')
+    assert key == cache.key(Board(), Rack('ba'), fake_lex, 10, play_sorter,
+                            'global')
+    assert key != cache.key(Board(), Rack('ab'), fake_lex, 5, play_sorter,
+                            'global')
+
+    os.utime(fake_lex.dawg_file, (1, 1))
+    assert key != cache.key(Board(), Rack('ab'), fake_lex, 10, play_sorter,
+                            'global')
+
+
+def test_solve_cache_round_trip(tmp_path, fake_lex, capsys):
+    path = str(tmp_path / 'cache' / 'solves.pkl')
+    cache = SolveCache(path=path)
+    keys = [cache.key(Board(), Rack(letters), fake_lex, 10, play_sorter,
+                      'global') for letters in ('ab', 'cd')]
+    cache.put(keys[0], [Play(word='ab', i=1, j=2, score=3, vertical=True)])
+    cache.put(keys[1], [])
+    cache.save()
+
+    loaded = SolveCache(path=path)
+    assert list(loaded._plays) == keys
+    assert loaded.get(keys[0]) == cache.get(keys[0])
+
+    with open(path, 'wb') as f:
+        f.write(b'not a pickle')
+    assert len(SolveCache(path=path)) == 0
+    assert 'Could not read solve cache' in capsys.readouterr().out
+
+
+def test_lexicon_stale_after_dictionary_edit(tmp_path):
+    words_file = tmp_path / 'words.txt'
+    words_file.write_text('cat\ndog\n')
+    lexicon = Lexicon((str(words_file),), str(tmp_path / 'words.dawg'))
+    assert lexicon.get_stale(('dawg',)) == ['dawg']
+
+    lexicon.ensure(('dawg',))
+    assert lexicon.get_stale(('dawg',), verify=True) == []
+    assert 'cat' in lexicon.dawg and 'cow' not in lexicon.dawg
+
+    # A new mtime alone doesn't make it stale, new contents do
+    os.utime(words_file, (1, 1))
+    assert not lexicon.is_stale('dawg')
+    words_file.write_text('cat\ncow\ndog\n')
+    assert lexicon.is_stale('dawg')
+
+    assert lexicon.ensure(('dawg',)) == ['dawg']
+    assert 'cow' in lexicon.dawg
+
+
+def _batch_records():
+    records = []
+    for n, letters in enumerate(('aeinrst', 'qzxjkvw', 'pesob?e', 'ssdpokb')):
+        board_file = ('example_board', 'test_board.txt')[n % 2]
+        records.append({'id': f'r{n}', 'rack': letters,
+                        'board_file': os.path.join(PACKAGE_DIR, board_file)})
+    records.insert(2, {'id': 'bad', 'rack': 'a1'})
+    return records
+
+
+def _batch_results(lex_dawg, **kwargs):
+    return [(record_id, error is None and
+             [play_record(play) for play in plays])
+            for record_id, plays, error in solve_batch(
+                _batch_records(), lex_dawg, k=3, **kwargs)]
+
+
+def test_solve_batch_order(lex_dawg):
+    ids = [record['id'] for record in _batch_records()]
+    ordered = _batch_results(lex_dawg)
+    assert [record_id for record_id, _ in ordered] == ids
+    assert dict(ordered)['bad'] is False
+
+    assert _batch_results(lex_dawg, in_flight=1, ordered=False) == ordered
+
+    unordered = _batch_results(lex_dawg, ordered=False)
+    assert sorted(unordered) == sorted(ordered)